@@ -0,0 +1,22 @@
+"""
+Block averaging shared by `tiles.pixelize` and `quantize.pixelize`.
+
+Kept on its own so either can use it without importing the other's filters.
+"""
+
+import numpy as np
+from numpy.typing import NDArray
+
+def block_mean(tile: NDArray, by: int, bx: int) -> NDArray:
+    """Replaces every (by, bx) block (partial at the far edges) with its mean, like `pixelize`."""
+    ys, xs = np.arange(0, tile.shape[0], by), np.arange(0, tile.shape[1], bx)
+    sums = np.add.reduceat(np.add.reduceat(tile, ys, axis = 0, dtype = np.float64), xs, axis = 1)
+    counts = np.outer(np.diff(ys, append = tile.shape[0]), np.diff(xs, append = tile.shape[1]))
+    means = sums / counts.reshape(counts.shape + (1,) * (tile.ndim - 2))
+    if np.issubdtype(tile.dtype, np.integer):
+        means = np.floor(means)
+    means = means.astype(tile.dtype)
+    return np.repeat(np.repeat(means, np.diff(ys, append = tile.shape[0]), axis = 0), np.diff(xs, append = tile.shape[1]), axis = 1)
+
+
+__all__ = ["block_mean"]
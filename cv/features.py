@@ -0,0 +1,296 @@
+"""
+Keypoint / descriptor cache for stitching.ipynb's `getKeypoints`.
+
+Features are keyed by a hash of the image *content* -- the pixels of an array, the
+bytes of a file -- plus the detector and OpenCV version, so re-running a mosaic over
+the same frames skips SIFT (and, for files, decoding) entirely, whatever they are called. Entries are stored as small `.npz` files:
+
+    - keypoints   (N, 7) float32: x, y, size, angle, response, octave, class_id
+    - descriptors (N, 128) uint8 when lossless (SIFT's always are), else float32
+
+The directory is kept under `max_bytes` by evicting least-recently-used entries
+(hits refresh the file's mtime). `getAllKeypoints` extracts the misses of a batch
+on a process pool; keypoints cross the process boundary as arrays, since
+`cv2.KeyPoint` does not pickle.
+"""
+
+import os
+import numpy as np
+from numpy.typing import NDArray
+from hashlib import blake2b
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+import threading
+
+# opencv is only needed to extract (and to rebuild cv2.KeyPoint objects)
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+def _require_cv2() -> None:
+    if cv2 is None:
+        raise ImportError("feature extraction needs opencv: pip install opencv-python")
+
+
+def _detector_tag() -> str:
+    return f"sift/{cv2.__version__ if cv2 else 'none'}"
+
+
+''' PACKING '''
+
+def _pack(keypoints: Sequence) -> NDArray[np.float32]:
+    return np.array(
+        [(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id) for k in keypoints],
+        dtype = np.float32,
+    ).reshape(-1, 7)
+
+
+def _unpack(packed: NDArray[np.float32]) -> tuple:
+    _require_cv2()
+    return tuple(
+        cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave), int(class_id))
+        for x, y, size, angle, response, octave, class_id in packed
+    )
+
+
+def _compact(descriptors: NDArray | None) -> NDArray:
+    if descriptors is None:
+        return np.empty((0, 128), dtype = np.uint8)
+    # SIFT descriptors are whole numbers in [0, 255] stored as float32: 4x smaller as uint8
+    if descriptors.dtype != np.uint8 and descriptors.size and descriptors.min() >= 0 and descriptors.max() <= 255:
+        as_u8 = descriptors.astype(np.uint8)
+        if np.array_equal(as_u8, descriptors):
+            return as_u8
+    return descriptors
+
+
+''' CACHE '''
+
+class FeatureCache:
+    """
+    On-disk, content-addressed LRU cache of (keypoints, descriptors).
+
+    Parameters:
+    -----------
+    root : str | Path, default=".kpcache"
+        Directory holding one `<hash>.npz` per image.
+    max_bytes : int, default=1 GiB
+        Size limit; least-recently-used entries are evicted past it.
+
+    Notes:
+    ------
+    - Writes are atomic (temp file + `os.replace`), so several processes can share a
+      directory; each one's size accounting is then approximate, never corrupt.
+    """
+
+    def __init__(self, root: str | Path = ".kpcache", max_bytes: int = 1 << 30):
+        self.root = Path(root)
+        self.root.mkdir(parents = True, exist_ok = True)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+        # key -> (last use, size)
+        self._index: dict[str, tuple[float, int]] = {}
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                self._index[entry.name[:-4]] = (stat.st_mtime, stat.st_size)
+        self._bytes = sum(size for _, size in self._index.values())
+
+    @staticmethod
+    def key(data: NDArray | bytes, tag: str | None = None) -> str:
+        """Content hash of an image array (shape and dtype included) or of raw bytes."""
+        h = blake2b(digest_size = 20)
+        h.update((tag or _detector_tag()).encode())
+        if isinstance(data, np.ndarray):
+            h.update(f"{data.shape}{data.dtype}".encode())
+            h.update(np.ascontiguousarray(data).data)
+        else:
+            h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.npz"
+
+    def get(self, key: str) -> tuple[NDArray[np.float32], NDArray] | None:
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                packed, descriptors = entry["keypoints"], entry["descriptors"]
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            size = self._index.get(key, (0, path.stat().st_size))[1]
+            self._index[key] = (os.path.getmtime(path), size)
+        return packed, descriptors
+
+    def put(self, key: str, packed: NDArray[np.float32], descriptors: NDArray) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, keypoints = packed, descriptors = _compact(descriptors))
+        os.replace(tmp, path)
+
+        size = path.stat().st_size
+        with self._lock:
+            old = self._index.get(key, (0, 0))[1]
+            self._index[key] = (os.path.getmtime(path), size)
+            self._bytes += size - old
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+            victims = []
+            for key, (_, size) in sorted(self._index.items(), key = lambda item: item[1][0]):
+                if self._bytes <= self.max_bytes:
+                    break
+                victims.append(key)
+                self._bytes -= size
+                del self._index[key]
+        for key in victims:
+            self._path(key).unlink(missing_ok = True)
+
+    def clear(self) -> None:
+        with self._lock:
+            keys, self._index, self._bytes = list(self._index), {}, 0
+        for key in keys:
+            self._path(key).unlink(missing_ok = True)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+
+''' EXTRACTION '''
+
+def _gray(image: NDArray) -> NDArray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def _extract(gray: NDArray) -> tuple[NDArray[np.float32], NDArray]:
+    sift = cv2.SIFT_create()
+    keypoints, descriptors = sift.detectAndCompute(image = gray, mask = None)
+    return _pack(keypoints), _compact(descriptors)
+
+
+def getKeypoints(image: NDArray, cache: FeatureCache | None = None):
+    """
+    SIFT keypoints and descriptors of a BGR (or grayscale) image, through `cache` if given.
+
+    Returns:
+    --------
+    tuple
+        (keypoints, descriptors, gray) -- like the notebook version. Descriptors come
+        back as float32 either way, which is what `cv2.BFMatcher` with NORM_L2 expects.
+    """
+    _require_cv2()
+    gray = _gray(image)  # cheap next to SIFT; not worth a full-size array on disk
+
+    key = cache.key(image) if cache is not None else None
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        entry = _extract(gray)
+        if cache is not None:
+            cache.put(key, *entry)
+
+    packed, descriptors = entry
+    return _unpack(packed), descriptors.astype(np.float32), gray
+
+
+def _extract_file(path: str) -> tuple[NDArray[np.float32], NDArray]:
+    return _extract(_gray(cv2.imread(path)))
+
+
+def _extract_array(image: NDArray) -> tuple[NDArray[np.float32], NDArray]:
+    return _extract(_gray(image))
+
+
+def getAllKeypoints(images: Sequence[NDArray | str | Path], cache: FeatureCache | None = None, workers: int | None = None) -> list:
+    """
+    `getKeypoints` over a batch: cached frames are read back, the rest go to a process pool.
+
+    Parameters:
+    -----------
+    images : Sequence[NDArray | str | Path]
+        BGR arrays or image paths. Paths are keyed by a hash of the file's bytes, so a
+        warm run never decodes them; only a miss is decoded, once, in its worker (only
+        the path, not the pixels, crosses the process boundary). A file and its decoded
+        array therefore have different keys.
+    cache : FeatureCache, optional
+        Cache to consult and fill.
+    workers : int, optional
+        Worker processes for the misses. Defaults to the CPU count.
+
+    Returns:
+    --------
+    list[tuple]
+        (keypoints, descriptors) per image, in order.
+    """
+    _require_cv2()
+    results: list = [None] * len(images)
+    keys: list = [None] * len(images)
+    todo = []
+
+    for i, image in enumerate(images):
+        if cache is not None:
+            if isinstance(image, (str, Path)):
+                keys[i] = cache.key(Path(image).read_bytes(), tag = f"{_detector_tag()}/file")
+            else:
+                keys[i] = cache.key(image)
+            if (entry := cache.get(keys[i])) is not None:
+                results[i] = entry
+                continue
+        todo.append(i)
+
+    if todo:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            jobs = {
+                i: pool.submit(_extract_file, str(images[i])) if isinstance(images[i], (str, Path)) else pool.submit(_extract_array, images[i])
+                for i in todo
+            }
+            for i, job in jobs.items():
+                results[i] = job.result()
+                if cache is not None:
+                    cache.put(keys[i], *results[i])
+
+    return [(_unpack(packed), descriptors.astype(np.float32)) for packed, descriptors in results]
+
+
+__all__ = ["FeatureCache", "getKeypoints", "getAllKeypoints"]
+
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    from time import perf_counter
+
+    frames = sys.argv[1:] or ["im1_left.jpg", "im1_center.jpg", "im1_right.jpg"]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = FeatureCache(Path(tmp) / "kpcache", max_bytes = 256 << 20)
+
+        for label in ("cold", "warm"):
+            start = perf_counter()
+            features = getAllKeypoints(frames, cache = cache)
+            print(f"[{label}] {len(frames)} frames in {perf_counter() - start:.2f} s "
+                  f"({sum(len(kp) for kp, _ in features)} keypoints, {cache.hits} hits / {cache.misses} misses, {cache.nbytes / 1e6:.1f} MB on disk)")
+        assert cache.hits == len(frames)  # the warm pass: no decoding, no SIFT
+
+        # the decoded array has its own (pixel) key: a miss, with the same features
+        kp, des, gray = getKeypoints(cv2.imread(frames[0]), cache = cache)
+        assert len(kp) == len(features[0][0]) and np.array_equal(des, features[0][1])
+        print("[TEST] getKeypoints on the array == batch result from the file")
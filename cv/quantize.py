@@ -0,0 +1,310 @@
+"""
+Lookup-table bit-depth quantization for uint8 / uint16 images.
+
+Reducing an image to `bits` per channel with float arithmetic (`round(image / step) * step`)
+allocates a float copy of the whole image per operation. For integer images every
+possible input value is known up front, so the whole mapping fits in a table:
+
+    - one LUT per (bits, dtype[, Bayer size]), built once and cached read-only
+    - applied with `np.take(lut, image, out = image)` -- in place, one gather per pixel
+    - ordered (Bayer) dithering is the same gather into a stacked table, indexed by
+      `threshold * levels + value`, so it costs one extra add per pixel
+    - any `(..., H, W)` or `(..., H, W, C)` stack goes through in cache-sized row blocks,
+      so the only temporary is one block of indices, however big the stack
+
+`pixelize` is the kernels.ipynb block-averaging version with an optional `depth`, for
+the usual pixel-art look of big blocks and few colours.
+"""
+
+import numpy as np
+from numpy.typing import NDArray
+from functools import lru_cache
+from typing import TypeVar, Literal
+
+from blocks import block_mean
+
+I = TypeVar("I", np.uint8, np.uint16)
+
+Layout = Literal["HW", "HWC"]
+
+# images are quantized this many pixels at a time -- the intp index block stays in cache
+BLOCK_PIXELS = 1 << 16
+
+BAYER_SIZES = (2, 4, 8)
+
+
+''' TABLES '''
+
+@lru_cache(maxsize = None)
+def _bayer(n: int) -> NDArray[np.intp]:
+    """The `(n, n)` Bayer index matrix (a permutation of `0 .. n*n - 1`), `n` a power of two."""
+    if n == 1:
+        return np.zeros((1, 1), dtype = np.intp)
+    m = 4 * _bayer(n // 2)
+    matrix = np.block([[m, m + 2], [m + 3, m + 1]])
+    matrix.setflags(write = False)
+    return matrix
+
+
+@lru_cache(maxsize = None)
+def _lut(bits: int, dtype: np.dtype, n: int = 1) -> NDArray:
+    """
+    The quantization table for `bits` per channel of `dtype`, read-only.
+
+    With `n == 1` it is the plain `(levels_in,)` table. With a Bayer size `n` it is the
+    `n * n` tables for every threshold, stacked: `lut[t * levels_in + v]` is value `v`
+    quantized with threshold `t`, whose offset is spread evenly over one output step.
+    """
+    top = np.iinfo(dtype).max
+    step = top / ((1 << bits) - 1)
+    thresholds = n * n
+    offsets = ((np.arange(thresholds) + 0.5) / thresholds - 0.5) * step if n > 1 else np.zeros(1)
+
+    values = np.arange(top + 1, dtype = np.float64)
+    levels = np.floor((values + offsets[:, None]) / step + 0.5)
+    np.clip(levels, 0, (1 << bits) - 1, out = levels)
+    lut = np.rint(levels * step).astype(dtype).ravel()
+    lut.setflags(write = False)
+    return lut
+
+
+''' QUANTIZE '''
+
+def _layout(image: NDArray, layout: Layout | None) -> Layout:
+    if layout is None:
+        # a trailing axis of at most 4 is colour channels (gray-alpha, RGB, RGBA)
+        return "HWC" if image.ndim >= 3 and image.shape[-1] <= 4 else "HW"
+    if layout not in ("HW", "HWC"):
+        raise ValueError(f"Unknown layout {layout!r}.")
+    if image.ndim < len(layout):
+        raise ValueError(f"A {layout} image needs at least {len(layout)} dimensions, got {image.shape}.")
+    return layout
+
+
+def quantize(
+    image: NDArray[I],
+    bits: int = 4,
+    dither: Literal["bayer"] | None = None,
+    size: int = 4,
+    layout: Layout | None = None,
+    out: NDArray[I] | None = None,
+) -> NDArray[I]:
+    """
+    Reduces a uint8 / uint16 image (or stack) to `bits` per channel through a lookup table.
+
+    Parameters:
+    -----------
+    image : NDArray[I]
+        A `(H, W)` / `(H, W, C)` image or a `(..., H, W)` / `(..., H, W, C)` stack, uint8 or uint16.
+    bits : int, default=4
+        Bits per channel to keep (1 to 8 for uint8, 1 to 16 for uint16). The `2**bits`
+        levels are spread over the full range, so white stays white.
+    dither : Literal["bayer"], optional
+        None (default) rounds to the nearest level; "bayer" adds an ordered-dither
+        threshold per pixel, tiled from the `(size, size)` Bayer matrix.
+    size : int, default=4
+        Side of the Bayer matrix (2, 4 or 8); only used when dithering.
+    layout : Literal["HW", "HWC"], optional
+        Whether the last axis is colour channels, which share a pixel's threshold. By
+        default a trailing axis of at most 4 on a 3D+ array is taken to be channels;
+        pass it explicitly for stacks of images only 4 pixels wide.
+    out : NDArray[I], optional
+        Preallocated output with `image`'s shape and dtype; `out = image` quantizes in place.
+
+    Returns:
+    --------
+    NDArray[I]
+        The quantized image, with `image`'s shape and dtype.
+
+    Notes:
+    ------
+    - The tables are cached per (bits, dtype, size): 256 B / 128 KB undithered, times
+      `size**2` dithered (8 MB for uint16 with an 8 x 8 matrix).
+    - Without dithering `layout` does not matter: every element goes through the same table.
+
+    Example:
+    --------
+    >>> quantize(photo, bits = 3, dither = "bayer", out = photo)   # 8 levels per channel, in place
+    """
+    image = np.asarray(image)
+    if image.dtype not in (np.uint8, np.uint16):
+        raise TypeError(f"quantize needs uint8 or uint16 images, got {image.dtype}.")
+    if not 1 <= bits <= 8 * image.dtype.itemsize:
+        raise ValueError(f"bits must be between 1 and {8 * image.dtype.itemsize} for {image.dtype}, got {bits}.")
+    if dither not in (None, "bayer"):
+        raise ValueError(f"Unknown dither {dither!r}.")
+    if dither and size not in BAYER_SIZES:
+        raise ValueError(f"Bayer size must be one of {BAYER_SIZES}, got {size}.")
+    if out is None:
+        out = np.empty_like(image)
+    elif out.shape != image.shape or out.dtype != image.dtype:
+        raise ValueError(f"out must be {image.shape} {image.dtype}, got {out.shape} {out.dtype}.")
+    if image.size == 0:
+        return out
+
+    n = size if dither else 1
+    lut = _lut(bits, image.dtype, n)
+
+    # rows of pixels: (..., H, W[, C]) -> (rows, W[, C]), a view whenever the arrays allow one
+    tail = image.shape[-1:] if n == 1 else image.shape[-(len(_layout(image, layout)) - 1):]
+    height = image.shape[-len(tail) - 1] if image.ndim > len(tail) else 1
+    src = image.reshape(-1, *tail)
+    dst = out.reshape(-1, *tail)
+    copy = not np.shares_memory(dst, out)
+    if copy:
+        dst = np.empty(dst.shape, dtype = out.dtype)
+
+    row = int(np.prod(tail))
+    step = max(n, BLOCK_PIXELS // row // n * n)
+    index = np.empty((min(step, len(src)), *tail), dtype = np.intp)
+
+    if n > 1:
+        # per Bayer row, the offset of every pixel's table: threshold * levels, shared by the channels
+        offsets = _bayer(n)[:, np.arange(tail[0]) % n] * len(lut) // (n * n)
+        if len(tail) == 2:
+            offsets = np.repeat(offsets[:, :, None], tail[1], axis = 2)
+        phase = np.arange(len(src)) % height % n
+
+    for i in range(0, len(src), step):
+        block = index[: min(step, len(src) - i)]
+        if n > 1:
+            np.take(offsets, phase[i : i + len(block)], axis = 0, out = block)
+            np.add(block, src[i : i + len(block)], out = block)
+        else:
+            np.copyto(block, src[i : i + len(block)])
+        np.take(lut, block, out = dst[i : i + len(block)], mode = "clip")
+
+    if copy:
+        out[...] = dst.reshape(out.shape)
+    return out
+
+
+''' PIXELIZE '''
+
+def pixelize(
+    image: NDArray[I],
+    bit: int = 32,
+    depth: int | None = None,
+    dither: Literal["bayer"] | None = None,
+) -> NDArray[I]:
+    """
+    Averages `(height // bit, width // bit)` blocks like kernels.ipynb's `pixelize`, then
+    optionally reduces the result to `depth` bits per channel.
+
+    Parameters:
+    -----------
+    image : NDArray[I]
+        A `(H, W)` or `(H, W, C)` image, uint8 or uint16 when `depth` is given.
+    bit : int, default=32
+        Number of blocks along each side (the notebook's block size is `image_y // bit`).
+    depth : int, optional
+        Bits per channel to quantize the averaged image to, in place, through `quantize`.
+    dither : Literal["bayer"], optional
+        Ordered dithering for the quantization; the Bayer matrix is tiled over blocks,
+        not pixels, so each block keeps one flat colour.
+
+    Returns:
+    --------
+    NDArray[I]
+        The pixelized image in `image`'s dtype (the notebook returned int32).
+    """
+    by, bx = max(1, image.shape[0] // bit), max(1, image.shape[1] // bit)
+    blocks = block_mean(image, by, bx)
+    if depth is None:
+        return blocks
+    if not dither:
+        return quantize(blocks, depth, out = blocks)
+
+    # dither one pixel per block, then blow the blocks back up
+    ys, xs = np.arange(0, image.shape[0], by), np.arange(0, image.shape[1], bx)
+    small = np.ascontiguousarray(blocks[ys][:, xs])
+    quantize(small, depth, dither = "bayer", layout = "HWC" if image.ndim == 3 else "HW", out = small)
+    return np.repeat(np.repeat(small, np.diff(ys, append = image.shape[0]), axis = 0), np.diff(xs, append = image.shape[1]), axis = 1)
+
+__all__ = ["quantize", "pixelize", "BLOCK_PIXELS", "BAYER_SIZES"]
+
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    def _quantize_float(image, bits):
+        # the element-wise float way: a float copy of the image per operation
+        step = np.iinfo(image.dtype).max / ((1 << bits) - 1)
+        return (np.round(image / step) * step).round().astype(image.dtype)
+
+    def _pixelize_loop(image, bit = 32):
+        # the loop from kernels.ipynb, minus the int32 cast at the end
+        image_y, image_x, _ = image.shape
+        kernel_y, kernel_x = image_y // bit, image_x // bit
+        pixelized_image = np.zeros_like(a = image, dtype = np.uint8)
+        for y in range(0, image_y, kernel_y):
+            for x in range(0, image_x, kernel_x):
+                pixelized_image[y : y + kernel_y, x : x + kernel_x] = image[y : y + kernel_y, x : x + kernel_x].mean(axis = (0, 1), dtype = int)
+        return pixelized_image
+
+    def timeit(fn, *args, repeat = 3, **kwargs):
+        best = float("inf")
+        for _ in range(repeat):
+            start = perf_counter()
+            fn(*args, **kwargs)
+            best = min(best, perf_counter() - start)
+        return best
+
+    rng = np.random.default_rng(0)
+
+    # the plain LUT matches the float arithmetic for every value, depth and dtype
+    for dtype in (np.uint8, np.uint16):
+        values = np.arange(np.iinfo(dtype).max + 1, dtype = dtype)
+        for bits in range(1, 8 * np.dtype(dtype).itemsize + 1):
+            assert np.array_equal(quantize(values, bits), _quantize_float(values, bits)), (dtype, bits)
+    print("[TEST] LUT == float quantization for every uint8 / uint16 value and depth")
+
+    # in place, on stacks, on non-contiguous views
+    stack = rng.integers(0, 256, (5, 37, 53, 3), dtype = np.uint8)
+    expected = _quantize_float(stack, 3)
+    copy = stack.copy()
+    assert quantize(copy, 3, out = copy) is copy and np.array_equal(copy, expected)
+    view = stack.copy()[:, ::2, 1:, ::-1]
+    assert np.array_equal(quantize(view, 3, out = view), expected[:, ::2, 1:, ::-1])
+    print("[TEST] in place, (N, H, W, C) stacks and strided views")
+
+    # dithering: per-pixel thresholds follow the Bayer tiling, channels share them,
+    # and a flat gray averages out to itself
+    for n in BAYER_SIZES:
+        flat = np.full((2, 64, 64, 3), 100, dtype = np.uint8)
+        dithered = quantize(flat, 1, dither = "bayer", size = n)
+        assert set(np.unique(dithered)) <= {0, 255}
+        assert (dithered == dithered[..., :1]).all() and (dithered[0] == dithered[1]).all()
+        assert abs(dithered.mean() - 100) < 255 / (n * n), (n, dithered.mean())
+        tile = dithered[0, :n, :n, 0]
+        assert np.array_equal(dithered[0, n : 2 * n, 3 * n : 4 * n, 0], tile)
+    gray = rng.integers(0, 65536, (3, 41, 29), dtype = np.uint16)
+    one = np.stack([quantize(g, 5, dither = "bayer", size = 8) for g in gray])
+    assert np.array_equal(quantize(gray, 5, dither = "bayer", size = 8, layout = "HW"), one)
+    odd = quantize(gray[:, :, :4], 5, dither = "bayer", size = 8, layout = "HW")
+    assert np.array_equal(odd, one[:, :, :4])
+    print("[TEST] Bayer dithering on stacks, shared by channels, mean-preserving on flat gray")
+
+    # pixelize: the notebook loop, then quantization of the blocks
+    image = rng.integers(0, 256, (256, 320, 3), dtype = np.uint8)
+    assert np.array_equal(pixelize(image, 32), _pixelize_loop(image, 32))
+    assert np.array_equal(pixelize(image, 32, depth = 2), _quantize_float(_pixelize_loop(image, 32), 2))
+    blocky = pixelize(image, 16, depth = 1, dither = "bayer")
+    assert (blocky[::16, ::20] == blocky[15::16, 19::20]).all()
+    print("[TEST] pixelize == kernels.ipynb loop, with depth and per-block dithering")
+
+    # bench: a 4K RGB frame and a stack of 16 1080p frames
+    frame = rng.integers(0, 256, (2160, 3840, 3), dtype = np.uint8)
+    frames = rng.integers(0, 256, (16, 1080, 1920, 3), dtype = np.uint8)
+    deep = rng.integers(0, 65536, (2160, 3840, 3), dtype = np.uint16)
+    print("\n[BENCH] 4 bits per channel")
+    for name, data in (("4K uint8", frame), ("4K uint16", deep), ("16 x 1080p uint8", frames)):
+        work = data.copy()
+        t_float = timeit(_quantize_float, data, 4)
+        t_lut = timeit(quantize, work, 4, out = work)
+        t_dither = timeit(quantize, work, 4, dither = "bayer", out = work)
+        print(f"{name:>18}: float {t_float * 1e3:7.1f} ms, LUT in place {t_lut * 1e3:7.1f} ms "
+              f"({t_float / t_lut:4.1f}x), Bayer in place {t_dither * 1e3:7.1f} ms")
+    print(f"{'pixelize 1080p':>18}: notebook loop {timeit(_pixelize_loop, frames[0], 64) * 1e3:7.1f} ms, "
+          f"block mean + 3 bits {timeit(pixelize, frames[0], 64, depth = 3) * 1e3:7.1f} ms")
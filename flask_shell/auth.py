@@ -0,0 +1,141 @@
+'''
+Cheaper authentication on the hot path.
+
+    - `CachedJWTManager`: drop-in `JWTManager` that remembers verified tokens until their `exp`
+    - `PasswordPool`:     runs bcrypt on a small bounded pool and sheds load when the backlog is full
+
+Run this file directly for a per-request overhead benchmark.
+'''
+
+from flask_jwt_extended import JWTManager
+from concurrent.futures import ThreadPoolExecutor, Future
+from hashlib import blake2b
+from cache import LRUCache
+import threading
+import time
+
+
+''' JWT '''
+
+class CachedJWTManager(JWTManager):
+    '''
+    `JWTManager` that caches decoded claims keyed by a hash of the raw token.
+
+    A hit skips the signature check and all three JSON/base64 decodes. Entries expire
+    at the token's `exp` claim (capped at `JWT_VERIFY_CACHE_TTL` seconds), so an expired
+    token is never served from cache. Blocklist callbacks still run on every request,
+    since flask_jwt_extended checks them after decoding.
+    '''
+
+    def init_app(self, app, *args, **kwargs) -> None:
+        super().init_app(app, *args, **kwargs)
+        self.verify_cache = LRUCache(app.config.get('JWT_VERIFY_CACHE_SIZE', 4096), ttl = 0)
+        self.verify_cache_ttl = app.config.get('JWT_VERIFY_CACHE_TTL', 300.0)
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value = None, allow_expired: bool = False) -> dict:
+        # cookie/CSRF and allow_expired decodes are rare -- don't bother caching them
+        if csrf_value is not None or allow_expired or not self.verify_cache.maxsize:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = blake2b(encoded_token.encode(), digest_size = 16).hexdigest()
+        if (claims := self.verify_cache.get(key)) is not None:
+            return dict(claims)  # callers may mutate what they get
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        ttl = self.verify_cache_ttl
+        if 'exp' in claims:
+            ttl = min(ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self.verify_cache.set(key, dict(claims), ttl)
+
+        return claims
+
+
+''' BCRYPT '''
+
+class Overloaded(RuntimeError):
+    '''Raised when too many password hashes are already queued.'''
+
+
+class PasswordPool:
+    '''
+    Runs bcrypt hashing/checking on a bounded thread pool.
+
+    bcrypt releases the GIL while it works, so a few pool threads use real cores while the
+    request threads stay free; `max_pending` caps the backlog so a login storm gets fast
+    503s instead of every worker queuing behind seconds of bcrypt.
+
+    Parameters:
+    -----------
+    bcrypt : flask_bcrypt.Bcrypt
+        The app's Bcrypt extension (its work factor comes from `BCRYPT_LOG_ROUNDS`).
+    workers : int, optional
+        Concurrent hashes. Defaults to the CPU count.
+    max_pending : int, optional
+        Hashes allowed in flight or queued before `Overloaded` is raised.
+    '''
+
+    def __init__(self, bcrypt, workers: int = None, max_pending: int = 64):
+        self.bcrypt = bcrypt
+        self._pool = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = 'bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking = False):
+            raise Overloaded('password hashing backlog is full')
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str, timeout: float = None) -> str:
+        '''Hashes `password` at the configured work factor.'''
+        return self._submit(self.bcrypt.generate_password_hash, password).result(timeout).decode()
+
+    def check(self, pw_hash: str, password: str, timeout: float = None) -> bool:
+        '''Checks `password` against a stored bcrypt hash.'''
+        return self._submit(self.bcrypt.check_password_hash, pw_hash, password).result(timeout)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait = False, cancel_futures = True)
+
+
+__all__ = ['CachedJWTManager', 'PasswordPool', 'Overloaded']
+
+
+
+if __name__ == '__main__':
+    from flask import Flask
+    from flask_bcrypt import Bcrypt
+    from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+    N = 20_000
+
+    def bench(manager_cls: type, label: str) -> None:
+        app = Flask(__name__)
+        app.config['JWT_SECRET_KEY'] = 'benchmark-secret-that-is-long-enough!'
+        manager_cls(app)
+
+        with app.app_context():
+            token = create_access_token(identity = 'dave')
+
+        with app.test_request_context(headers = {'Authorization': f'Bearer {token}'}):
+            verify_jwt_in_request()  # warm up
+            start = time.perf_counter()
+            for _ in range(N):
+                verify_jwt_in_request()
+            per = (time.perf_counter() - start) / N
+        print(f'[JWT] {label:<18} {per * 1e6:8.2f} us/request')
+
+    bench(JWTManager, 'JWTManager')
+    bench(CachedJWTManager, 'CachedJWTManager')
+
+    app = Flask(__name__)
+    for rounds in (4, 8, 10, 12):
+        app.config['BCRYPT_LOG_ROUNDS'] = rounds
+        pool = PasswordPool(Bcrypt(app))
+        start = time.perf_counter()
+        pw_hash = pool.hash('open the pod bay doors')
+        pool.check(pw_hash, 'open the pod bay doors')
+        print(f'[BCRYPT] rounds = {rounds:<2} {(time.perf_counter() - start) * 1e3 / 2:8.2f} ms/op')
+        pool.shutdown()
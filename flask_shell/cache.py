@@ -0,0 +1,295 @@
+'''
+Response caching for the flask shell's read endpoints.
+
+Two interchangeable backends share a tiny interface (`get`, `set`, `incr`):
+
+    - `LRUCache`:   in-process, bounded, per-entry TTL (default)
+    - `RedisCache`: any Redis-protocol server (Redis, Valkey, KeyDB, or a fakeredis client in dev)
+
+Cache keys are namespaced by JWT identity plus two generation numbers -- a global one
+and a per-identity one -- so invalidating after a write is one counter bump instead of
+a key scan; stale entries simply age out of the backend. Rows are shared between users,
+so writes bump the global generation by default: every user's cached reads go stale,
+not just the writer's. `invalidates(everyone = False)` is only for views whose data is
+private to the caller.
+
+NOTE: the memory backend is per process -- under multiple gunicorn workers a write
+only invalidates the worker that handled it, so use CACHE_BACKEND=redis there.
+'''
+
+from flask import request, Response, make_response
+from collections import OrderedDict
+from typing import Callable, TypeVar, Any
+from hashlib import blake2b
+from time import monotonic
+import functools
+import threading
+import pickle
+
+# redis is optional
+try:
+    import redis
+except ImportError:
+    redis = None
+
+F = TypeVar('F', bound = Callable)  # generic function type
+
+
+''' BACKENDS '''
+
+class LRUCache:
+    '''
+    Thread-safe in-process LRU with a time-to-live per entry.
+
+    Counters (the per-identity generations) are an LRU of `maxsize` too. Every `incr` takes
+    the next value of one shared sequence, and an evicted counter reads as the highest value
+    evicted so far -- never below what it last was, so dropping one can't bring back a
+    response cached under an older generation; at worst it costs a few extra misses.
+    '''
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._counters: OrderedDict[str, int] = OrderedDict()
+        self._sequence = 0  # last value handed out by `incr`
+        self._floor = 0     # highest value of an evicted counter
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        '''Returns the live value for `key`, or None if it is missing or expired.'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)  # mark as recently used
+            return value
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        '''Stores `value`, evicting the least recently used entry when full.'''
+        expires = monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last = False)
+
+    def incr(self, key: str) -> int:
+        '''Atomically moves a counter past every value it has had and returns the new value.'''
+        with self._lock:
+            self._sequence += 1
+            self._counters[key] = self._sequence
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.maxsize:
+                _, value = self._counters.popitem(last = False)
+                self._floor = max(self._floor, value)
+            return self._sequence
+
+    def counter(self, key: str) -> int:
+        '''Current value of a counter; one never incremented (or evicted) reads as the eviction floor.'''
+        with self._lock:
+            value = self._counters.get(key)
+            if value is None:
+                return self._floor
+            self._counters.move_to_end(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    '''
+    Redis-protocol backend, so cached responses are shared between worker processes.
+
+    Pass either a URL or a ready-made client (e.g. `fakeredis.FakeRedis()` for local development).
+    '''
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', ttl: float = 60.0, prefix: str = 'flask_shell:', client: Any = None):
+        if client is None:
+            if not redis:
+                raise ImportError(f"\n\n\t\"I'm sorry dave. redis hasn't been installed.\"\n\t - HAL 9000")
+            client = redis.Redis.from_url(url)
+
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol = pickle.HIGHEST_PROTOCOL), px = max(1, int(ttl * 1000)))
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def counter(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match = self.prefix + '*'):
+            self.client.delete(key)
+
+
+''' RESPONSE CACHE '''
+
+def _identity() -> str:
+    '''JWT identity of the current request, or "anon" on unprotected routes.'''
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        identity = get_jwt_identity()
+    except RuntimeError:  # verify_jwt_in_request() never ran
+        identity = None
+    return 'anon' if identity is None else str(identity)
+
+
+class ResponseCache:
+    '''
+    Caches successful GET responses per (identity, path, query string) with ETag support.
+
+    Usage:
+    ------
+        @app.route('/GET', methods = ['GET'])
+        @jwt_required()
+        @cache.cached()
+        def get(): ...
+
+        @app.route('/PUT', methods = ['PUT'])
+        @jwt_required()
+        @cache.invalidates()
+        def put(): ...
+
+    Decorators must sit *below* `jwt_required` so the identity is known.
+    '''
+
+    def __init__(self, app = None, backend: LRUCache | RedisCache = None):
+        self.backend = backend
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        '''Builds the backend from `CACHE_*` config unless one was passed in.'''
+        kind = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_TTL', 60.0)
+        self.enabled = kind != 'none'
+
+        if self.backend is None and self.enabled:
+            if kind == 'redis':
+                self.backend = RedisCache(app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl = ttl)
+            else:
+                self.backend = LRUCache(app.config.get('CACHE_MAXSIZE', 1024), ttl = ttl)
+
+        app.extensions['response_cache'] = self
+
+    def _key(self, identity: str) -> str:
+        gen = self.backend.counter(f'gen:{identity}')
+        everyone = self.backend.counter('gen:*')
+        query = '&'.join(sorted(request.query_string.decode('latin-1').split('&')))  # ?a=1&b=2 == ?b=2&a=1
+        return f'{identity}:{everyone}.{gen}:{request.path}?{query}'
+
+    def cached(self, ttl: float = None) -> Callable[[F], F]:
+        '''Decorator that serves a GET view from the cache and answers If-None-Match with 304.'''
+
+        def decorator(func: F) -> F:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled or request.method != 'GET':
+                    return func(*args, **kwargs)
+
+                key = self._key(_identity())
+
+                if (hit := self.backend.get(key)) is not None:
+                    etag, status, mimetype, body = hit
+                    response = Response(body, status = status, mimetype = mimetype)
+                    response.set_etag(etag)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response.make_conditional(request)
+
+                response = make_response(func(*args, **kwargs))
+
+                # only cache complete, successful, non-streamed bodies
+                if response.status_code == 200 and not response.is_streamed:
+                    body = response.get_data()
+                    etag = blake2b(body, digest_size = 16).hexdigest()
+                    self.backend.set(key, (etag, response.status_code, response.mimetype, body), ttl)
+                    response.set_etag(etag)
+                    response.headers['X-Cache'] = 'MISS'
+                    return response.make_conditional(request)
+
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, identity: str = None, everyone: bool = False) -> None:
+        '''Drops every cached response for all users when `everyone`, else for `identity` (default: current user).'''
+        if not self.enabled:
+            return
+        self.backend.incr('gen:*' if everyone else f'gen:{identity or _identity()}')
+
+    def invalidates(self, everyone: bool = True) -> Callable[[F], F]:
+        '''
+        Decorator for write views: invalidates the cache after a successful (< 400) response.
+
+        A write can change rows any user reads, so by default every user's entries are dropped.
+        Pass `everyone = False` only when the view writes data that only its caller can read.
+        '''
+
+        def decorator(func: F) -> F:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code < 400:
+                    self.invalidate(everyone = everyone)
+                return response
+            return wrapper
+        return decorator
+
+
+__all__ = ['LRUCache', 'RedisCache', 'ResponseCache']
+
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+
+    # a long-lived worker sees many identities: counters stay bounded, and a dropped one
+    # never reads below a generation its identity has already used
+    lru = LRUCache(maxsize = 64)
+    seen = {}
+    for i in range(10_000):
+        identity = f'gen:user{i % 500}'
+        before = lru.counter(identity)
+        assert before >= seen.get(identity, 0), (identity, before, seen[identity])
+        seen[identity] = lru.incr(identity)
+        assert seen[identity] > before
+    assert len(lru._counters) <= 64
+    print(f'[TEST] 500 identities, 10,000 writes: {len(lru._counters)} counters kept, none went backwards')
+
+    # stale responses are not served again after their identity's counter is evicted
+    lru = LRUCache(maxsize = 4)
+    key = lambda identity: f'{identity}:{lru.counter("gen:*")}.{lru.counter(f"gen:{identity}")}:/GET?'
+    lru.set(key('dave'), 'before the write')
+    lru.incr('gen:dave')
+    for i in range(8):
+        lru.incr(f'gen:other{i}')  # pushes dave's counter out
+    assert 'gen:dave' not in lru._counters and lru.get(key('dave')) is None
+    print('[TEST] evicting a generation does not resurrect responses cached under an older one')
+
+    lru = LRUCache(maxsize = 128)
+    with ThreadPoolExecutor(8) as pool:
+        values = list(pool.map(lambda i: (lru.incr(f'gen:user{i % 300}'), lru.counter(f'gen:user{i % 300}')), range(20_000)))
+    assert len({v for v, _ in values}) == 20_000 and len(lru._counters) <= 128
+    print('[TEST] concurrent incr / counter: unique generations, bounded table')
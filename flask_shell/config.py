@@ -2,31 +2,125 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from sqlalchemy.ext.declarative import declarative_base
-from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
+from cache import ResponseCache
+from auth import CachedJWTManager, PasswordPool
+from metrics import Metrics
+from pathlib import Path
+import os
+
+# .env support is optional
+try:
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent / '.env')
+except ImportError:
+    pass
+
+
+''' ENVARS '''
+
+def _env(key: str, default = None, cast: type = str):
+    '''
+    Reads a setting from the environment, falling back to `default` when unset.
+
+    Booleans accept 1/true/yes/on (case-insensitive); everything else is passed through `cast`.
+    '''
+    value = os.environ.get(key)
+    if value is None or value == '':
+        return default
+    if cast is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return cast(value)
+
+
+def _engine_options(uri: str) -> dict:
+    '''
+    Builds the SQLAlchemy engine/pool options from the environment.
+
+    In-memory SQLite runs on a single-connection pool, so the queue sizing knobs are left out for it.
+    '''
+    options = {
+        'pool_pre_ping': _env('DB_POOL_PRE_PING', True, bool),  # test connections before handing them out
+        'pool_recycle': _env('DB_POOL_RECYCLE', 1800, int),     # seconds before a connection is replaced
+    }
+    if uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri):
+        return options
+
+    options.update({
+        'pool_size': _env('DB_POOL_SIZE', 10, int),         # connections kept open per worker
+        'max_overflow': _env('DB_MAX_OVERFLOW', 20, int),   # extra connections allowed under burst
+        'pool_timeout': _env('DB_POOL_TIMEOUT', 30, int),   # seconds to wait for a free connection
+    })
+    return options
 
 
 ''' FLASK '''
 
 app = Flask(__name__)
+app.config['DEBUG'] = _env('FLASK_DEBUG', False, bool)
 CORS(app)
 
 
 ''' SQL ALCHEMY '''
 
+# NOTE: everything the engine needs must be set BEFORE SQLAlchemy(app) builds it
+app.config['SQLALCHEMY_DATABASE_URI'] = _env('DATABASE_URL', 'sqlite:///flask_shell.db') # this is the database URL
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
 # link flask to sql database
 db = SQLAlchemy(app)
-app.config['SQLALCHEMY_DATABASE_URI'] = "" # this is the database URL
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 Base = declarative_base() # initialize sqlalchemy
 
 
 ''' JAVA WEB TOKENS '''
 
-app.config['JWT_SECRET_KEY'] = "" # this is your public key (if using JWT authentication)
-jwt = JWTManager(app)  # initialize JWT
+app.config['JWT_SECRET_KEY'] = _env('JWT_SECRET_KEY', '') # this is your public key (if using JWT authentication)
+app.config['JWT_VERIFY_CACHE_SIZE'] = _env('JWT_VERIFY_CACHE_SIZE', 4096, int)  # verified tokens kept (0 disables)
+app.config['JWT_VERIFY_CACHE_TTL'] = _env('JWT_VERIFY_CACHE_TTL', 300.0, float) # upper bound, never past `exp`
+jwt = CachedJWTManager(app)  # initialize JWT
 
 
 ''' BCRYPT '''
 
-bcrypt = Bcrypt(app)
\ No newline at end of file
+app.config['BCRYPT_LOG_ROUNDS'] = _env('BCRYPT_LOG_ROUNDS', 12, int)  # work factor: each +1 doubles the cost
+bcrypt = Bcrypt(app)
+passwords = PasswordPool(                                             # keep bcrypt off the request threads
+    bcrypt,
+    workers = _env('BCRYPT_WORKERS', os.cpu_count() or 1, int),
+    max_pending = _env('BCRYPT_MAX_PENDING', 64, int),
+)
+
+
+''' RESPONSE CACHE '''
+
+app.config['CACHE_BACKEND'] = _env('CACHE_BACKEND', 'memory')  # memory | redis | none
+app.config['CACHE_TTL'] = _env('CACHE_TTL', 60.0, float)      # seconds
+app.config['CACHE_MAXSIZE'] = _env('CACHE_MAXSIZE', 1024, int)  # entries (memory backend)
+app.config['CACHE_REDIS_URL'] = _env('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+cache = ResponseCache(app)
+
+
+''' BULK '''
+
+app.config['BULK_CHUNK_SIZE'] = _env('BULK_CHUNK_SIZE', 1000, int)  # rows per executemany / streamed chunk
+app.config['BULK_TABLES'] = frozenset(t.strip() for t in _env('BULK_TABLES', '').split(',') if t.strip())  # comma-separated; nothing is exposed unless listed
+
+
+''' METRICS '''
+
+app.config['SLOW_REQUEST_MS'] = _env('SLOW_REQUEST_MS', 500.0, float)         # log/flag requests slower than this
+app.config['PROFILE_SAMPLE_RATE'] = _env('PROFILE_SAMPLE_RATE', 0.0, float)   # fraction of requests run under cProfile
+app.config['PROFILE_DIR'] = _env('PROFILE_DIR', 'profiles')                   # where slow sampled profiles are dumped
+app.config['DEBUGGERNAUT_PATH'] = _env('DEBUGGERNAUT_PATH', str(Path(__file__).resolve().parents[1] / 'helpfuls' / 'debuggernaut_v1.2'))  # heimdahl banners for slow requests
+metrics = Metrics(app)  # serves /metrics
+
+
+''' SERVING '''
+
+# read by wsgi.py when running under a production server
+app.config['HOST'] = _env('HOST', '0.0.0.0')
+app.config['PORT'] = _env('PORT', 5000, int)
+app.config['WEB_WORKERS'] = _env('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1, int)  # processes
+app.config['WEB_THREADS'] = _env('WEB_THREADS', 4, int)                             # threads per process
+app.config['WEB_TIMEOUT'] = _env('WEB_TIMEOUT', 30, int)                            # seconds per request
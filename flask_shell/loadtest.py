@@ -0,0 +1,115 @@
+'''
+Small load generator for the flask shell.
+
+Without `--url` it boots the app against a throwaway SQLite file on a local
+threaded server and hammers `/health`; with `--url` it targets whatever is
+already running (e.g. `python wsgi.py`). Reports req/s and p50/p99 latency.
+
+    python loadtest.py -n 5000 -c 16
+    python loadtest.py --url http://127.0.0.1:5000/health -n 20000 -c 64
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from time import perf_counter
+import http.client
+import tempfile
+import threading
+import os
+
+
+def _worker(url: str, n: int) -> list[float]:
+    '''Issues `n` GETs over one keep-alive connection and returns each latency in seconds.'''
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += f'?{parts.query}'
+
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout = 30)
+    latencies = []
+
+    for _ in range(n):
+        start = perf_counter()
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(perf_counter() - start)
+
+        if response.status >= 500:
+            raise RuntimeError(f'{url} returned {response.status}')
+
+    conn.close()
+    return latencies
+
+
+def _percentile(ordered: list[float], p: float) -> float:
+    '''Nearest-rank percentile of an already sorted list.'''
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1)]
+
+
+def run(url: str, requests: int = 5000, concurrency: int = 16) -> dict[str, float]:
+    '''
+    Fires `requests` GETs at `url` from `concurrency` client threads.
+
+    Returns:
+    --------
+    dict[str, float]:
+        Total requests, wall seconds, req/s, and p50/p99 latency in milliseconds.
+    '''
+    per_worker = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers = concurrency) as executor:
+        results = executor.map(_worker, [url] * concurrency, per_worker)
+        latencies = sorted(t for batch in results for t in batch)
+    elapsed = perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 50) * 1e3,
+        'p99_ms': _percentile(latencies, 99) * 1e3,
+    }
+
+
+def _local_server() -> tuple[str, object]:
+    '''Boots the app on a random port against a temporary SQLite database (local stand-in).'''
+    db_file = os.path.join(tempfile.mkdtemp(prefix = 'flask_shell_'), 'load.db')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{db_file}')
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from wsgi import app
+
+    class _Handler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like a real server
+        def log_request(self, *args, **kwargs) -> None:
+            pass  # per-request logging would dominate the measurement
+
+    server = make_server('127.0.0.1', 0, app, threaded = True, request_handler = _Handler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return f'http://127.0.0.1:{server.server_port}/health', server
+
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Load test the flask shell.')
+    parser.add_argument('--url', default = None, help = 'target URL (default: local SQLite stand-in)')
+    parser.add_argument('-n', '--requests', type = int, default = 5000)
+    parser.add_argument('-c', '--concurrency', type = int, default = 16)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url, server = _local_server()
+
+    stats = run(url, args.requests, args.concurrency)
+    print(f"[LOAD] {url}")
+    print(f"[LOAD] {stats['requests']:,} requests in {stats['seconds']:.2f}s @ {args.concurrency} clients")
+    print(f"[LOAD] {stats['rps']:,.0f} req/s | p50 {stats['p50_ms']:.2f} ms | p99 {stats['p99_ms']:.2f} ms")
+
+    if server:
+        server.shutdown()
@@ -0,0 +1,237 @@
+'''
+Request timing, DB accounting and slow-request profiling for the flask shell.
+
+Per-route latency, DB time and query counts are kept as cumulative histograms and
+served from `/metrics` in the Prometheus text format. DB statements are counted
+through SQLAlchemy cursor events, so nothing in the views has to change.
+
+Slow requests (over `SLOW_REQUEST_MS`) are logged, flagged with debuggernaut's
+`heimdahl` banner when the dev reloader is running, and, if they happened to be
+sampled (`PROFILE_SAMPLE_RATE`), their cProfile stats are dumped to `PROFILE_DIR`.
+
+debuggernaut is not a pip package: its directory (`helpfuls/debuggernaut_v1.2`) is not
+an importable name, so an installed `debuggernaut` is used if there is one, and otherwise
+the package is loaded from `DEBUGGERNAUT_PATH` (config / env). Without either, slow
+requests are only logged.
+
+NOTE: numbers are per process; with several workers, scrape each one or sum them.
+'''
+
+from flask import g, request, Response, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import defaultdict
+from time import perf_counter, strftime
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable
+import importlib.util
+import threading
+import cProfile
+import random
+import sys
+
+# prometheus' default latency buckets (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class Histogram:
+    '''
+    Thread-safe labelled histogram with fixed upper bounds, rendered as a Prometheus histogram.
+    '''
+
+    def __init__(self, name: str, doc: str, buckets: tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+
+        for key, series in items:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in key)
+            sep = ',' if labels else ''
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    '''Thread-safe labelled counter, rendered as a Prometheus counter.'''
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._series: defaultdict[tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, n: int = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] += n
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = list(self._series.items())
+        for key, value in items:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in key)
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _heimdahl(path: str | Path | None = None) -> Callable | None:
+    '''
+    debuggernaut's `heimdahl`: from an installed `debuggernaut`, else from the package
+    directory at `path` (imported as `debuggernaut`), else None.
+    '''
+    try:
+        from debuggernaut import heimdahl
+        return heimdahl
+    except ImportError:
+        pass
+
+    init = Path(path).expanduser() / '__init__.py' if path else None
+    if init is None or not init.is_file():
+        return None
+    spec = importlib.util.spec_from_file_location('debuggernaut', init, submodule_search_locations = [str(init.parent)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['debuggernaut'] = module  # its submodules import relative to this name
+    try:
+        spec.loader.exec_module(module)
+        return module.heimdahl
+    except Exception:
+        del sys.modules['debuggernaut']
+        return None
+
+
+''' SQLALCHEMY HOOKS '''
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault('_metrics_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stack = conn.info.get('_metrics_start')
+    if not stack:
+        return
+    elapsed = perf_counter() - stack.pop()
+    if has_request_context() and 'metrics_db' in g:
+        g.metrics_db[0] += 1
+        g.metrics_db[1] += elapsed
+
+
+''' EXTENSION '''
+
+class Metrics:
+    '''
+    Flask extension wiring the hooks above into an app and exposing `/metrics`.
+    '''
+
+    def __init__(self, app = None):
+        self.latency = Histogram('http_request_duration_seconds', 'Request latency by route.')
+        self.db_time = Histogram('http_request_db_seconds', 'Time spent in DB statements per request.')
+        self.db_queries = Histogram('http_request_db_queries', 'DB statements executed per request.', COUNT_BUCKETS)
+        self.requests = Counter('http_requests_total', 'Requests by route, method and status.')
+        self.slow = Counter('http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.slow_ms = app.config.get('SLOW_REQUEST_MS', 500.0)
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.profile_dir = Path(app.config.get('PROFILE_DIR', 'profiles'))
+        self.heimdahl = _heimdahl(app.config.get('DEBUGGERNAUT_PATH'))
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', self.render)
+        app.extensions['metrics'] = self
+
+    def _start(self) -> None:
+        g.metrics_db = [0, 0.0]  # [statements, seconds]
+        g.metrics_profiler = None
+        if self.sample_rate and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.metrics_profiler = profiler
+            except ValueError:  # another thread is already being profiled (3.12+)
+                pass
+        g.metrics_start = perf_counter()
+
+    def _finish(self, response: Response) -> Response:
+        if 'metrics_start' not in g:  # an earlier before_request short-circuited
+            return response
+
+        elapsed = perf_counter() - g.metrics_start
+        if (profiler := g.metrics_profiler) is not None:
+            profiler.disable()
+
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'  # bounded label cardinality
+        queries, db_seconds = g.metrics_db
+
+        self.latency.observe(elapsed, route = route, method = request.method)
+        self.db_time.observe(db_seconds, route = route, method = request.method)
+        self.db_queries.observe(queries, route = route, method = request.method)
+        self.requests.inc(route = route, method = request.method, status = str(response.status_code))
+
+        if elapsed * 1e3 >= self.slow_ms:
+            self._slow(route, elapsed, queries, db_seconds, profiler)
+
+        response.headers['Server-Timing'] = f'app;dur={elapsed * 1e3:.2f}, db;dur={db_seconds * 1e3:.2f}'
+        return response
+
+    def _slow(self, route: str, elapsed: float, queries: int, db_seconds: float, profiler: cProfile.Profile | None) -> None:
+        self.slow.inc(route = route, method = request.method)
+        msg = f'SLOW {request.method} {route} {elapsed * 1e3:.0f} ms ({queries} queries, {db_seconds * 1e3:.0f} ms db)'
+
+        if profiler is not None:
+            self.profile_dir.mkdir(parents = True, exist_ok = True)
+            dump = self.profile_dir / f"{strftime('%Y%m%d-%H%M%S')}_{request.endpoint or 'unmatched'}_{int(elapsed * 1e3)}ms.prof"
+            profiler.dump_stats(dump)
+            msg += f' -> {dump}'
+
+        self.app.logger.warning(msg)
+        if self.heimdahl:
+            self.heimdahl(msg, unveil = self.app.debug, threat = 3 if elapsed * 1e3 >= 4 * self.slow_ms else 2)
+
+    def render(self) -> Response:
+        lines = []
+        for metric in (self.latency, self.db_time, self.db_queries, self.requests, self.slow):
+            lines.extend(metric.render())
+        return Response('\n'.join(lines) + '\n', content_type = 'text/plain; version=0.0.4; charset=utf-8')
+
+
+__all__ = ['Metrics', 'Histogram', 'Counter']
@@ -1,6 +1,20 @@
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required # get_jwt_identity : useful to get user ID as a search parameter
-from config import app
+from sqlalchemy import text
+from sqlalchemy.exc import StatementError
+from config import app, db, cache, passwords, Base
+from auth import Overloaded
+from bulk import resolve_table, iter_ndjson, bulk_insert, stream_rows
+
+
+''' ERRORS '''
+
+@app.errorhandler(Overloaded)
+def overloaded(e: Overloaded):
+
+    # NOTE: Password hashing backlog is full -- shed the request instead of parking a worker behind bcrypt.
+
+    return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
 
 
 ''' POST functions '''
@@ -10,6 +24,7 @@ from config import app
 def login():
 
     # NOTE: Endpoint to handle login requests. Validates credentials and returns a JWT token for authorized users.
+    # NOTE: Check passwords with `passwords.check(user.pw_hash, password)` (a full backlog answers 503).
 
     jwt_token, status = "", ""
     return jsonify(jwt_token), status
@@ -19,32 +34,68 @@ def login():
 def new_user():
 
     # NOTE: Endpoint to register a new user. Handles POST requests to create a user-specific account.
+    # NOTE: Hash passwords with `passwords.hash(password)` rather than calling bcrypt on the request thread.
 
     response, status = "", ""
     return jsonify(response), status
 
 @app.route('/POST', methods = ['POST'])
-@jwt_required
+@jwt_required()
+@cache.invalidates()
 def post():
     # NOTE: Endpoint to handle POST requests
 
     response, status = "", ""
     return jsonify(response), status
 
+# BULK INSERT
+@app.route('/POST/bulk/<table>', methods = ['POST'])
+@jwt_required()
+@cache.invalidates()
+def post_bulk(table: str):
+
+    # NOTE: Ingests an NDJSON body (one row object per line) in chunked executemany batches. One request, one JWT check.
+
+    try:
+        inserted = bulk_insert(db, resolve_table(db, table, app.config['BULK_TABLES'], Base.metadata), iter_ndjson(request.stream), app.config['BULK_CHUNK_SIZE'])
+    except (ValueError, StatementError) as e:  # malformed line / rejected row -- whole batch is rolled back
+        return jsonify({'error': str(e).splitlines()[0]}), 400
+    return jsonify({'inserted': inserted}), 201
+
 
 ''' GET functions '''
 
+# HEALTH CHECK
+@app.route('/health', methods = ['GET'])
+def health():
+
+    # NOTE: Unauthenticated liveness probe for load balancers. Round-trips the connection pool with a `SELECT 1`.
+
+    db.session.execute(text('SELECT 1'))
+    return jsonify({'status': 'ok'}), 200
+
 @app.route('/GET', methods = ['GET'])
 @jwt_required()
+@cache.cached()
 def get():
     # NOTE: Endpoint to handle GET requests
     pass
 
+# STREAMING EXPORT
+@app.route('/GET/stream/<table>', methods = ['GET'])
+@jwt_required()
+def get_stream(table: str):
+
+    # NOTE: Streams a whole table as NDJSON with a server-side cursor, so memory stays flat for any result size. Not cached.
+
+    return stream_rows(db, resolve_table(db, table, app.config['BULK_TABLES'], Base.metadata), app.config['BULK_CHUNK_SIZE'])
+
 
 ''' PUT functions '''
 
 @app.route('/PUT', methods = ['PUT'])
 @jwt_required()
+@cache.invalidates()
 def put():
     # NOTE: Endpoint to handle PUT requests
     pass
@@ -54,6 +105,7 @@ def put():
 
 @app.route('/DEL', methods = ['DELETE'])
 @jwt_required()
+@cache.invalidates()
 def delete():
     # NOTE: Endpoint to handle DELETE requests
     pass
@@ -63,6 +115,7 @@ def delete():
 
 @app.route('/PATCH', methods = ['PATCH'])
 @jwt_required()
+@cache.invalidates()
 def patch():
     # NOTE: Endpoint to handle PATCH requests
     pass
@@ -70,7 +123,5 @@ def patch():
 
 
 if __name__ == '__main__':
-    app.run(host = "0.0.0.0", port = 5000, debug = True)
-    
-
-    
\ No newline at end of file
+    # NOTE: development server only -- use `python wsgi.py` in production
+    app.run(host = app.config['HOST'], port = app.config['PORT'], debug = app.config['DEBUG'])
@@ -0,0 +1,72 @@
+'''
+Production entry point for the flask shell.
+
+Run directly (`python wsgi.py`) to serve with gunicorn (multi-process, Unix) or
+waitress (multi-threaded, any OS), or point an external server at `wsgi:app`:
+
+    gunicorn -w 9 --threads 4 -b 0.0.0.0:5000 wsgi:app
+'''
+
+from config import app
+import server  # registers the routes on `app`
+
+# production servers are optional -- whichever is installed gets used
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+
+if BaseApplication:
+    class _Gunicorn(BaseApplication):
+        '''Embeds gunicorn so the worker settings come from `config.py` instead of the CLI.'''
+
+        def __init__(self, application, options: dict):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def serve() -> None:
+    '''
+    Serves `app` with the best available production server.
+
+    Raises:
+    -------
+    ImportError:
+        If neither gunicorn nor waitress is installed.
+    '''
+    host, port = app.config['HOST'], app.config['PORT']
+    workers, threads = app.config['WEB_WORKERS'], app.config['WEB_THREADS']
+
+    if BaseApplication:
+        _Gunicorn(app, {
+            'bind': f'{host}:{port}',
+            'workers': workers,
+            'threads': threads,
+            'timeout': app.config['WEB_TIMEOUT'],
+            'worker_class': 'gthread' if threads > 1 else 'sync',
+        }).run()
+    elif waitress:
+        # waitress is single-process, so give it the combined thread budget
+        waitress.serve(app, host = host, port = port, threads = workers * threads)
+    else:
+        raise ImportError(f"\n\n\t\"I'm sorry dave. Neither gunicorn nor waitress has been installed.\"\n\t - HAL 9000")
+
+
+
+if __name__ == '__main__':
+    serve()
@@ -1,7 +1,46 @@
-from .pests import pesticide, larva
-from .HAL import HAL9000
+'''
+debuggernaut: pesticide / larva, HAL9000, heimdahl, peek and the colrs helpers.
+
+Only `colrs` (a few string lambdas) is imported with the package. Every other public
+name is loaded from its submodule the first time it is used, through the module-level
+`__getattr__`, so `from debuggernaut import pesticide` never pays for heimdahl's
+inspect / shutil / pathlib or peek's numpy. `python <package dir>` checks that budget.
+'''
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 from .colrs import *
 from .colrs import __all__ as colr
-from .heimdahl import heimdahl
 
-__all__ = ['pesticide', 'HAL9000', 'colr', 'larva', 'heimdahl'] + colr
\ No newline at end of file
+# public name -> submodule it lives in
+_LAZY = {
+    'pesticide': 'pests',
+    'larva': 'pests',
+    'HAL9000': 'HAL',
+    'heimdahl': 'heimdahl',
+    'peek': 'peek',
+}
+
+if TYPE_CHECKING:
+    from .pests import pesticide, larva
+    from .HAL import HAL9000
+    from .heimdahl import heimdahl
+    from .peek import peek
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(f'.{_LAZY[name]}', __name__), name)
+    # bound after the import, which sets the submodule itself as an attribute
+    # of the package (heimdahl and peek share their module's name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
+
+
+__all__ = ['pesticide', 'HAL9000', 'colr', 'larva', 'heimdahl', 'peek'] + colr
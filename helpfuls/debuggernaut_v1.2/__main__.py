@@ -0,0 +1,152 @@
+'''
+Self-checks for the package: `python helpfuls/debuggernaut_v1.2` (or `python -m debuggernaut`).
+
+The package is loaded from this directory as `debuggernaut`, whatever the directory is called.
+
+    - import budget: each check imports it in a fresh interpreter and compares
+      `sys.modules` and the wall time against a bare interpreter's
+    - pesticide sampling: 1-in-N and rate-limited tracing, `larva()` per call, skip cost
+'''
+
+import os
+import sys
+import json
+import importlib.util
+import subprocess
+
+PACKAGE = os.path.dirname(os.path.abspath(__file__))
+
+# `from debuggernaut import pesticide` may load at most this much on top of a bare interpreter
+# (it is 10 modules -- typing, threading and the package's own three -- and ~4 ms; importing
+# everything eagerly, as the package used to, was 138 modules and ~70 ms with numpy installed)
+BUDGET_MODULES = 12
+BUDGET_MS = 15.0
+HEAVY = ('inspect', 'shutil', 'pathlib', 'traceback', 'numpy', 'reprlib', 'ast', 'dis', 'tokenize')
+
+_PROBE = '''
+import sys, json, time, importlib.util
+before = set(sys.modules)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('debuggernaut', {init!r}, submodule_search_locations = [{package!r}])
+module = importlib.util.module_from_spec(spec)
+sys.modules['debuggernaut'] = module
+spec.loader.exec_module(module)
+{statement}
+took = (time.perf_counter() - start) * 1e3
+print(json.dumps({{'modules': sorted(set(sys.modules) - before), 'ms': took}}))
+'''
+
+
+def load():
+    '''The package, imported in this interpreter as `debuggernaut`.'''
+    if 'debuggernaut' not in sys.modules:
+        spec = importlib.util.spec_from_file_location('debuggernaut', os.path.join(PACKAGE, '__init__.py'), submodule_search_locations = [PACKAGE])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['debuggernaut'] = module
+        spec.loader.exec_module(module)
+    return sys.modules['debuggernaut']
+
+
+def footprint(statement: str = '', repeat: int = 5) -> tuple[list[str], float]:
+    '''The modules `statement` (after importing the package) adds to `sys.modules`, and its best time in ms.'''
+    code = _PROBE.format(init = os.path.join(PACKAGE, '__init__.py'), package = PACKAGE, statement = statement)
+    best, modules = float('inf'), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-I', '-c', code], capture_output = True, text = True, check = True)
+        result = json.loads(out.stdout)
+        best, modules = min(best, result['ms']), result['modules']
+    return modules, best
+
+
+if __name__ == '__main__':
+    modules, ms = footprint('from debuggernaut import pesticide, larva')
+    heavy = [name for name in modules if name.split('.')[0] in HEAVY]
+    print(f'[BUDGET] from debuggernaut import pesticide: {len(modules)} modules, {ms:.2f} ms\n\t{modules}')
+    assert not heavy, f'pesticide pulled in {heavy}'
+    assert len(modules) <= BUDGET_MODULES, f'{len(modules)} modules > budget of {BUDGET_MODULES}: {modules}'
+    assert ms <= BUDGET_MS, f'{ms:.2f} ms > budget of {BUDGET_MS} ms'
+
+    # every public name still resolves, and only loads its own submodule
+    for name, submodule in (('HAL9000', 'HAL'), ('heimdahl', 'heimdahl'), ('peek', 'peek')):
+        modules, ms = footprint(f'from debuggernaut import {name}; assert not isinstance({name}, type(sys))')
+        assert f'debuggernaut.{submodule}' in modules and 'debuggernaut.pests' not in modules, modules
+        print(f'[BUDGET] from debuggernaut import {name}: {len(modules)} modules, {ms:.2f} ms')
+
+    modules, _ = footprint('from debuggernaut import *; import debuggernaut; assert set(debuggernaut.__all__) <= set(dir(debuggernaut))', repeat = 1)
+    print(f'[TEST] import * resolves all of __all__ ({len(modules)} modules)')
+
+    # sampling
+    import io
+    from time import perf_counter, sleep
+    from contextlib import redirect_stdout
+    debuggernaut = load()
+    pesticide, larva = debuggernaut.pesticide, debuggernaut.larva
+
+    @pesticide(enabled = True, every = 10)
+    def hot(x):
+        return larva()
+
+    @pesticide(enabled = True)
+    def inner():
+        return larva()
+
+    @pesticide(enabled = True, every = 3)
+    def outer():
+        return larva(), inner(), larva()
+
+    with redirect_stdout(io.StringIO()) as text:
+        flags = [hot(i) for i in range(1000)]
+        nested = [outer() for _ in range(3)]
+    assert flags == [i % 10 == 0 for i in range(1000)]
+    assert hot.sampler.stats() == {'calls': 1000, 'sampled': 100, 'skipped': 900}, hot.sampler.stats()
+    assert text.getvalue().count('Calling') == 100 + 1 + 3
+    assert nested == [(True, True, True), (False, True, False), (False, True, False)]
+    assert not larva()
+    print('[TEST] every = 10 traces calls 0, 10, 20, ... and larva() is True in exactly those')
+
+    @pesticide(enabled = True, rate = 20)
+    def limited():
+        return larva()
+
+    with redirect_stdout(io.StringIO()):
+        start, traced = perf_counter(), 0
+        while perf_counter() - start < 1.0:
+            traced += limited()
+            sleep(0.0001 if traced % 2 else 0)
+    took, stats = perf_counter() - start, limited.sampler.stats()
+    assert stats['sampled'] == traced and 20 * took * 0.5 <= traced <= 20 * took + 1, (traced, took, stats)
+    print(f'[TEST] rate = 20/s: {traced} of {stats["calls"]:,} calls traced in {took:.2f} s')
+
+    # a burst must not leave a countdown that a slower caller takes minutes to run down
+    @pesticide(enabled = True, rate = 10)
+    def bursty():
+        return larva()
+
+    with redirect_stdout(io.StringIO()):
+        for _ in range(2_000_000):
+            bursty()
+        before = bursty.sampler.sampled
+        start = perf_counter()
+        while perf_counter() - start < 2.0:
+            bursty()
+            sleep(0.01)
+    slow = bursty.sampler.sampled - before
+    assert bursty.sampler.left <= debuggernaut.pests.FLOOR / 10 and slow >= 5, (slow, bursty.sampler.left)
+    print(f'[TEST] rate = 10/s after 2M fast calls: {slow} traced in 2 s at 100 calls/s')
+
+    def plain():
+        return None
+
+    off, skip = pesticide(enabled = False)(plain), pesticide(enabled = True, every = 1 << 30)(plain)
+    with redirect_stdout(io.StringIO()):
+        skip()  # the first call is always traced
+    timings = {}
+    for name, fn in (('plain', plain), ('disabled', off), ('sampled out', skip)):
+        best = float('inf')
+        for _ in range(5):
+            start = perf_counter()
+            for _ in range(200_000):
+                fn()
+            best = min(best, perf_counter() - start)
+        timings[name] = best / 200_000 * 1e9
+    print('[BENCH] ns per call: ' + ', '.join(f'{name} {ns:.0f}' for name, ns in timings.items()))
@@ -0,0 +1,290 @@
+'''
+Bounded inspector for nested data -- bugkit.ipynb's `_show` without the copies.
+
+`_show` ran `list(data.items())[:depth]` and `list(data)[:depth]`, copying a whole
+multi-million-entry dict or set to print five of it, and recursed with no guard
+against self-references. `peek` walks the same structures but:
+
+    - takes the first items with `itertools.islice`, so only what is printed is touched
+    - summarizes numpy arrays by shape, dtype and stats (on a strided sample past
+      `STATS_LIMIT` elements) instead of printing or converting them
+    - marks a container that contains itself as a cycle instead of recursing forever
+    - stops after `budget` characters of output, however big the structure
+
+so the cost depends on the output, not on the data.
+'''
+
+import sys
+import reprlib
+from itertools import islice
+from collections.abc import Mapping, Set, Sequence, Collection
+from typing import Any, TextIO
+
+# numpy is optional -- without it arrays are just objects
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STATS_LIMIT = 1 << 16  # arrays bigger than this get their stats from a strided sample of this size
+
+_leaf = reprlib.Repr()
+_leaf.maxstring = _leaf.maxother = 80
+_leaf.maxlong = 40
+
+
+class _Budget(Exception):
+    '''Raised by `_Out` once the output budget is spent.'''
+
+
+class _Out:
+    def __init__(self, file: TextIO, budget: int):
+        self.file = file
+        self.left = budget
+
+    def line(self, text: str) -> None:
+        if len(text) + 1 > self.left:
+            self.file.write(text[: max(0, self.left - 1)] + '\n')
+            raise _Budget
+        self.file.write(text + '\n')
+        self.left -= len(text) + 1
+
+
+''' ARRAYS '''
+
+def _scalar(x) -> str:
+    if isinstance(x, float):
+        return f'{x:.6g}'
+    return _leaf.repr(x)
+
+
+def _sample(a: 'np.ndarray') -> tuple['np.ndarray', bool]:
+    '''
+    `a`, or a strided view of at most STATS_LIMIT elements of it, strided along every axis
+    (shortest first, each taking its share of what the shorter ones left of the limit).
+    '''
+    if a.size <= STATS_LIMIT:
+        return a, False
+    index = [slice(None)] * a.ndim
+    left = STATS_LIMIT
+    for rest, axis in zip(range(a.ndim, 0, -1), np.argsort(a.shape, kind = 'stable')):
+        dim = a.shape[axis]
+        keep = min(dim, max(1, int(left ** (1 / rest) + 1e-9)))
+        step = -(-dim // keep)
+        index[axis] = slice(None, None, step)
+        left //= -(-dim // step)
+    return a[tuple(index)], True
+
+
+def _stats(a: 'np.ndarray') -> str:
+    if a.size == 0 or a.dtype.kind not in 'biuf':
+        return ''
+    view, sampled = _sample(a)
+    approx = '~' if sampled else ''
+    if view.dtype.kind == 'b':
+        return f' true={approx}{np.count_nonzero(view) / view.size:.1%}'
+    nans = ''
+    if view.dtype.kind == 'f':
+        n = int(np.count_nonzero(np.isnan(view)))
+        if n:
+            nans = f' nan={approx}{n / view.size:.1%}'
+        if n == view.size:
+            return nans
+        lo, hi, mean, std = np.nanmin(view), np.nanmax(view), np.nanmean(view, dtype = np.float64), np.nanstd(view, dtype = np.float64)
+    else:
+        lo, hi, mean, std = view.min(), view.max(), view.mean(dtype = np.float64), view.std(dtype = np.float64)
+    return f' min={approx}{lo:.4g} max={approx}{hi:.4g} mean={approx}{mean:.4g} std={approx}{std:.4g}{nans}'
+
+
+def _array(a: 'np.ndarray', out: _Out, tab: str, items: int) -> None:
+    out.line(f'{tab}(NDARRAY){a.shape} {a.dtype}{_stats(a)}:')
+    if a.ndim == 0:
+        out.line(f'{tab}\t{_scalar(a.item())}')
+        return
+    # the leading corner: first `items` of the first two axes, index 0 on the rest
+    corner = (slice(0, items),) * min(a.ndim, 2) + (0,) * (a.ndim - 2)
+    label = ', '.join([f':{items}'] * min(a.ndim, 2) + ['0'] * (a.ndim - 2))
+    rows = a[corner] if a.ndim > 1 else a[corner][None]
+    for row in rows:
+        more = ', ...' if a.shape[-1 if a.ndim == 1 else 1] > items else ''
+        out.line(f'{tab}\t[{", ".join(_scalar(x.item() if hasattr(x, "item") else x) for x in row)}{more}]')
+    if a.ndim > 1 and a.shape[0] > items:
+        out.line(f'{tab}\t[...]')
+    if a.ndim > 2:
+        out.line(f'{tab}\t(shown: [{label}])')
+
+
+''' WALK '''
+
+def _walk(data: Any, out: _Out, nested: int, depth: int, items: int, tab: str, ancestors: set[int]) -> None:
+    _type = type(data).__name__.upper()
+
+    if nested >= depth:
+        out.line(f'{tab}[...]')
+        return
+
+    if np is not None and isinstance(data, np.ndarray):
+        _array(data, out, tab, items)
+        return
+
+    is_mapping = isinstance(data, Mapping)
+    is_container = is_mapping or (isinstance(data, (Sequence, Set, Collection)) and not isinstance(data, (str, bytes, bytearray, memoryview)))
+    if not is_container:
+        # BASE CASE: primitives and anything we do not know how to open
+        out.line(f'{tab}{_leaf.repr(data)}')
+        return
+
+    if id(data) in ancestors:
+        out.line(f'{tab}<cycle: ({_type}) at {id(data):#x}>')
+        return
+    ancestors.add(id(data))
+    try:
+        try:
+            size = len(data)
+        except TypeError:
+            size = '?'
+        out.line(f'{tab}({_type})({size}):')
+
+        shown = 0
+        if is_mapping:
+            for k, v in islice(data.items(), items):
+                if isinstance(v, (Mapping, Collection)) and not isinstance(v, (str, bytes)) or (np is not None and isinstance(v, np.ndarray)):
+                    out.line(f'{tab}\t[{_leaf.repr(k)}]:')
+                    _walk(v, out, nested + 1, depth, items, tab + '\t\t', ancestors)
+                else:
+                    out.line(f'{tab}\t[{_leaf.repr(k)}]: {_leaf.repr(v)}')
+                shown += 1
+        else:
+            for item in islice(data, items):
+                _walk(item, out, nested + 1, depth, items, tab + '\t', ancestors)
+                shown += 1
+
+        if size == '?' or size > shown:
+            out.line(f'{tab}\t[...]')
+    finally:
+        ancestors.discard(id(data))
+
+
+def peek(data: Any, depth: int = 5, items: int = 5, budget: int = 4096, file: TextIO | None = None) -> None:
+    '''
+    Prints the first `items` elements of every nested structure, `depth` levels deep.
+
+    Parameters:
+    -----------
+    data : Any
+        Dicts and other mappings, lists, tuples, sets, deques, ranges, numpy arrays, ...
+        Iterators and generators are shown but never consumed.
+    depth : int, default=5
+        Levels of nesting to open.
+    items : int, default=5
+        Elements shown per container (rows and columns for arrays).
+    budget : int, default=4096
+        Characters of output at most; the walk stops there.
+    file : TextIO, optional
+        Where to print (stdout by default).
+
+    Example:
+    --------
+    >>> peek({'ids': range(10**9), 'x': np.zeros((100_000, 512), np.float32)}, items = 2)
+    (DICT)(2):
+        ['ids']:
+            (RANGE)(1000000000):
+                0
+                1
+                [...]
+        ['x']:
+            (NDARRAY)(100000, 512) float32 min=~0 max=~0 mean=~0 std=~0:
+                [0, 0, ...]
+                [0, 0, ...]
+                [...]
+    '''
+    out = _Out(file or sys.stdout, budget)
+    try:
+        _walk(data, out, 0, depth, items, '', set())
+    except _Budget:
+        out.file.write(f'[... output budget of {budget} characters reached]\n')
+
+
+def _show(data: Any, nested: int = 0, depth: int = 5, head: bool = True) -> None:
+    '''
+    bugkit.ipynb's signature: prints the first `depth` elements of each nested structure,
+    `depth - nested` levels deep, indented by `nested` tabs unless `head`.
+    '''
+    out = _Out(sys.stdout, 4096)
+    try:
+        _walk(data, out, nested, depth, depth, '' if head else '\t' * nested, set())
+    except _Budget:
+        out.file.write('[... output budget reached]\n')
+
+
+__all__ = ['peek', '_show']
+
+
+
+if __name__ == '__main__':
+    import io
+    from time import perf_counter
+
+    test_data = {
+        'bananas': [[1, 2, 3], [4, 5, 50, 60, 70, 0, 7], [8, 9, 10, 11, 12]],
+        'xray': ([13, 14, 15], (16, 17, 18)),
+        'jimmy': {
+            'corelations': [19, 20, 21, 22],
+            'lib': {'a': 23, 'b': 24, 'c': [25, 26, 27]},
+        },
+        'soccer_score': np.array([[28, 29, 30], [31, 32, 33]]),
+    }
+    _show(test_data)
+    _show(np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100]))
+
+    # cycles
+    loop = [1, 2]
+    loop.append(loop)
+    knot = {'self': None}
+    knot['self'] = knot
+    text = io.StringIO()
+    peek([loop, knot], file = text)
+    assert text.getvalue().count('<cycle') == 2, text.getvalue()
+    print('\n[TEST] self-referencing list and dict are reported as cycles')
+
+    # generators are shown, not consumed
+    gen = (i for i in range(3))
+    peek(gen, file = io.StringIO())
+    assert list(gen) == [0, 1, 2]
+
+    # big: ~10 GB of (virtual) data -- a huge dict, set and range, and a 2 GB array
+    huge = {i: str(i) for i in range(3_000_000)}
+    bag = set(range(3_000_000))
+    array = np.lib.stride_tricks.as_strided(np.arange(1.0, 2.0), shape = (1 << 17, 1 << 17), strides = (0, 0))  # 128 GB, 8 bytes of memory
+    real = np.random.default_rng(0).standard_normal((4096, 65536), dtype = np.float32)  # 1 GB
+    data = {'huge': huge, 'bag': bag, 'ids': range(10 ** 12), 'virtual': array, 'real': real, 'nested': [[[[[[[1]]]]]]]}
+
+    def bench(fn):
+        start = perf_counter()
+        fn()
+        return (perf_counter() - start) * 1e3
+
+    text = io.StringIO()
+    took = bench(lambda: peek(data, file = text))
+    print(f'\n{text.getvalue()}')
+    assert len(text.getvalue()) < 4096 + 100
+
+    old = bench(lambda: (list(huge.items())[:5], list(bag)[:5]))
+    print(f'[BENCH] peek over the dict / set / range / 128 GB + 1 GB arrays: {took:.1f} ms; '
+          f'the notebook\'s list(...)[:5] on just the dict and set: {old:.0f} ms')
+
+    # samples stay bounded whatever the shape, on every axis
+    for shape in ((3000, 3000, 3000), (20000,) * 3, (2, 10 ** 9), (7, 11, 10 ** 6, 3), (10 ** 12,)):
+        virtual = np.lib.stride_tricks.as_strided(np.arange(1.0, 2.0), shape = shape, strides = (0,) * len(shape))
+        view, sampled = _sample(virtual)
+        assert sampled and STATS_LIMIT // 16 <= view.size <= STATS_LIMIT, (shape, view.shape)
+    cube = np.lib.stride_tricks.as_strided(np.arange(1.0, 2.0), shape = (20000,) * 3, strides = (0, 0, 0))  # 64 TB
+    took = bench(lambda: peek(cube, file = io.StringIO()))
+    view, _ = _sample(real)
+    assert view.shape[0] > 1 and view.shape[1] > 1 and abs(view.mean()) < 0.05
+    print(f'[TEST] 3-D (20000,)*3 array summarized from {_sample(cube)[0].size:,} samples in {took:.1f} ms')
+
+    text = io.StringIO()
+    peek([list(range(1000))] * 1000, depth = 3, items = 1000, budget = 2048, file = text)
+    assert len(text.getvalue()) < 2048 + 100 and 'budget' in text.getvalue()
+    print('[TEST] output stops at the budget')
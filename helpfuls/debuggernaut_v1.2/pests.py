@@ -1,5 +1,6 @@
 from typing import Callable, TypeVar, Any
 import threading
+from time import monotonic
 from .colrs import RD, BU, YW
 import functools
 
@@ -7,23 +8,92 @@ import functools
 BUGS = _debug_stack = threading.local()
 F = TypeVar('F', bound = Callable)  # generic function type
 
+CHECKS = 4     # clock reads per rate interval in rate-limited sampling, however many calls there are
+FLOOR = 1_000  # calls per second at which one countdown still spans at most one rate interval
+
+
+class _Sampler:
+    '''
+    Decides which calls of one decorated function are traced.
+
+    Every call decrements `left`; only when it runs out does `expire` run, so a skipped
+    call costs that one decrement. With `every` the countdown is fixed. With `rate` it is
+    retuned at each expiry from the observed call rate, so the clock is read about CHECKS
+    times per `1 / rate` seconds, and a call is traced once that long has passed since
+    the last traced one. The countdown is capped at FLOOR * interval calls, so after a
+    burst the next trace is at most one interval late for callers at FLOOR calls/s or
+    faster, and FLOOR / calls-per-second intervals late for slower ones.
+    '''
+    __slots__ = ('every', 'interval', 'cap', 'left', 'period', 'calls', 'sampled', 'read', 'last')
+
+    def __init__(self, every: int = 1, rate: float | None = None):
+        self.every = every
+        self.interval = 1 / rate if rate else None
+        self.cap = max(1, int(FLOOR / rate)) if rate else None
+        self.left = self.period = 1  # the first call is always traced
+        self.calls = self.sampled = 0
+        self.read = self.last = None
+
+    def expire(self) -> bool:
+        self.calls += self.period
+        if self.interval is None:
+            self.left = self.period = self.every
+            self.sampled += 1
+            return True
+
+        now = monotonic()
+        if self.read is not None and now > self.read:
+            per_second = self.period / (now - self.read)
+            self.period = min(self.cap, max(1, int(per_second * self.interval / CHECKS)))
+        self.left, self.read = self.period, now
+
+        if self.last is None or now - self.last >= self.interval:
+            self.last = now
+            self.sampled += 1
+            return True
+        return False
+
+    def stats(self) -> dict[str, int]:
+        calls = self.calls + self.period - max(self.left, 0)
+        return {'calls': calls, 'sampled': self.sampled, 'skipped': calls - self.sampled}
+
+
 class pesticide:
-    def __init__(self, *, enabled: bool = False):
+    '''
+    Traces calls of the decorated function when `enabled`, and makes `larva()` True inside them.
+
+    `every = N` traces 1 call in N; `rate = r` traces at most about r calls per second
+    and takes precedence over `every` (both count per decorated function). Untraced calls
+    run with `larva()` False, and `func.sampler.stats()` counts calls, sampled and skipped.
+    '''
+    def __init__(self, *, enabled: bool = False, every: int = 1, rate: float | None = None):
+        if every < 1:
+            raise ValueError(f'every must be at least 1, got {every}.')
+        if rate is not None and rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}.')
         self.enabled = enabled
+        self.every = every
+        self.rate = rate
 
     def __call__(self, func: F) -> F:
+        sampler = _Sampler(self.every, self.rate) if self.every > 1 or self.rate else None
+
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
             if not hasattr(_debug_stack, 'nest'):
                 _debug_stack.nest = []
 
-            _debug_stack.nest.append(self.enabled)
+            traced = self.enabled
+            if traced and sampler is not None:
+                sampler.left -= 1
+                traced = sampler.left <= 0 and sampler.expire()
 
-            class_name = None
-            if args:
-                class_name = args[0].__class__.__name__
+            _debug_stack.nest.append(traced)
 
-            if self.enabled:
+            class_name = None
+            if traced:
+                if args:
+                    class_name = args[0].__class__.__name__
                 if class_name:
                     print(f'{RD("[DEBUG]")} {BU("Calling")} \'{class_name}.{func.__name__}\'')
                 else:
@@ -34,19 +104,20 @@ class pesticide:
             finally:
                 _debug_stack.nest.pop()
 
-                if self.enabled:
+                if traced:
                     if class_name:
                         print(f'{RD("[DEBUG]")} {YW("Exiting")} \'{class_name}.{func.__name__}\'')
                     else:
                         print(f'{RD("[DEBUG]")} {YW("Exiting")} \'{func.__name__}\'')
 
 
+        wrapper.sampler = sampler
         return wrapper
 
     @staticmethod
     def larva() -> bool:
-        '''Returns True if the current function is in debug mode.'''
-        return hasattr(BUGS, 'nest') and BUGS.nest and BUGS.nest[-1]
-    
+        '''Returns True if the current function is in debug mode (and, when sampling, this call is sampled).'''
+        return bool(hasattr(BUGS, 'nest') and BUGS.nest and BUGS.nest[-1])
+
 larva = pesticide.larva
-__all__ = ['pesticide', 'larva']
\ No newline at end of file
+__all__ = ['pesticide', 'larva']
@@ -0,0 +1,255 @@
+'''
+On-disk result cache for `Sigarette.compute`.
+
+A sum is identified by what decides its value:
+
+    - the expression, normalized through `ast` (so spacing and redundant parentheses don't matter)
+    - every variable's grid as (start, step, count), in name order
+    - the precision and the backend with its version (numexpr / numpy or cupy)
+
+Entries live in one SQLite file, which does the locking: any number of processes
+(and threads) can read and write it at once, and a crash mid-write leaves the last
+committed state. Every hit refreshes the entry's timestamp, and once there are more
+than `max_entries` the least recently used are dropped.
+
+Incremental ranges: when nothing matches exactly, a cached sum whose grid is the same
+on every variable but one -- and on that one is an aligned sub-range of the query -- is
+reused, and only the slabs below and above it are computed:
+
+    sum(x = 1..2000, y) = cached sum(x = 1..1500, y) + sum(x = 1501..2000, y)
+
+This is only done for integer start and step, where the slab grids are exact; the total
+is the cached value plus the slabs, so it can differ from a direct sum in the last bits.
+'''
+
+import os
+import ast
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from math import ceil
+from pathlib import Path
+from typing import Any, Callable
+
+VERSION = 1  # cache format; bumping it orphans every old entry
+
+Grid = tuple[float, float, int]  # (start, step, count)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sums (
+    key     TEXT PRIMARY KEY,
+    family  TEXT NOT NULL,
+    grids   TEXT NOT NULL,
+    value   BLOB NOT NULL,
+    used    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sums_family ON sums (family);
+CREATE INDEX IF NOT EXISTS sums_used ON sums (used);
+'''
+
+
+''' KEYS '''
+
+def _normalize(expr: str) -> str:
+    '''The expression as `ast` prints it back; unparsable ones are kept as written.'''
+    try:
+        return ast.unparse(ast.parse(expr.strip(), mode = 'eval'))
+    except SyntaxError:
+        return expr.strip()
+
+
+def _grid(start: float, end: float, step: float) -> Grid:
+    '''The points of `arange(start, end + 1, step)` as (start, step, count), integral floats as ints.'''
+    start, step = (int(v) if _integral(v) else v for v in (start, step))
+    return start, step, max(0, ceil((end + 1 - start) / step))
+
+
+def _integral(*values: float) -> bool:
+    return all(isinstance(v, int) or (isinstance(v, float) and v.is_integer()) for v in values)
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, separators = (',', ':')).encode()).hexdigest()
+
+
+def _plain(value: Any) -> Any:
+    '''Device results (cupy 0-d arrays) come back to the host before pickling.'''
+    return value.get() if type(value).__module__.startswith('cupy') else value
+
+
+class SumCache:
+    '''
+    Persistent, size-bounded LRU cache of summation results.
+
+    Parameters:
+    -----------
+    path : str | Path
+        The SQLite file (created with its directory if missing). A directory is
+        given `sums.sqlite3` inside it.
+    max_entries : int, default=100_000
+        Entries kept; the least recently used beyond this are evicted.
+    incremental : bool, default=True
+        Reuse cached sums over sub-ranges, computing only the missing slabs.
+    timeout : float, default=60.0
+        Seconds to wait for another process's write lock before giving up.
+
+    Example:
+    --------
+    >>> engine = Sigarette(cache = '~/.cache/sigarette')
+    >>> engine.compute('x * y', x = (1, 10_000, 1), y = (1, 10_000, 1))   # computed
+    >>> engine.compute('x*y', x = (1, 20_000, 1), y = (1, 10_000, 1))     # + x = 10001..20000 only
+    '''
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000, incremental: bool = True, timeout: float = 60.0):
+        path = Path(path).expanduser()
+        if path.is_dir() or not path.suffix:
+            path = path / 'sums.sqlite3'
+        path.parent.mkdir(parents = True, exist_ok = True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.incremental = incremental
+        self.timeout = timeout
+        self.hits = self.extended = self.misses = 0
+
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+
+
+    def _connect(self) -> sqlite3.Connection:
+        # a connection must not cross a fork: every process opens its own
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout = self.timeout, isolation_level = None, check_same_thread = False)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+
+    def _get(self, key: str) -> tuple[bool, Any]:
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT value FROM sums WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return False, None
+            db.execute('UPDATE sums SET used = ? WHERE key = ?', (time.time(), key))
+        return True, pickle.loads(row[0])
+
+
+    def _put(self, key: str, family: str, grids: dict[str, Grid], value: Any) -> None:
+        blob = pickle.dumps(_plain(value))
+        with self._lock:
+            db = self._connect()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute('INSERT OR REPLACE INTO sums VALUES (?, ?, ?, ?, ?)',
+                           (key, family, json.dumps(grids), blob, time.time()))
+                (count,) = db.execute('SELECT COUNT(*) FROM sums').fetchone()
+                if count > self.max_entries:
+                    db.execute('DELETE FROM sums WHERE key IN (SELECT key FROM sums ORDER BY used LIMIT ?)',
+                               (count - self.max_entries,))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+
+    def _base(self, family: str, grids: dict[str, Grid]) -> tuple[str, Grid, Any] | None:
+        '''
+        The cached sum covering most of the query that differs from it on one variable only,
+        as (variable, its cached grid, value); None when there is none.
+        '''
+        with self._lock:
+            rows = self._connect().execute('SELECT key, grids, value FROM sums WHERE family = ?', (family,)).fetchall()
+
+        best, cover = None, 0
+        for key, cached, value in rows:
+            cached = {var: tuple(g) for var, g in json.loads(cached).items()}
+            differ = [var for var in grids if cached[var] != grids[var]]
+            if len(differ) != 1:
+                continue
+            (var,) = differ
+            (start, step, count), (c_start, c_step, c_count) = grids[var], cached[var]
+            if not _integral(start, step, c_start) or c_step != step or c_count == 0:
+                continue
+            offset = (c_start - start) / step
+            if offset.is_integer() and 0 <= offset and offset + c_count <= count and c_count > cover:
+                best, cover = (key, var, cached[var], value), c_count
+
+        if best is None:
+            return None
+        key, var, grid, value = best
+        with self._lock:
+            self._connect().execute('UPDATE sums SET used = ? WHERE key = ?', (time.time(), key))
+        return var, grid, pickle.loads(value)
+
+
+    def sum(self, expr: str, ranges: dict[str, tuple], precision: str, backend: str, evaluate: Callable[..., Any]) -> Any:
+        '''
+        `evaluate(expr, **ranges)`, from the cache when possible.
+
+        Parameters:
+        -----------
+        expr : str
+            The summand, as given to `Sigarette.compute`.
+        ranges : dict[str, tuple]
+            (start, end, step) per variable.
+        precision : str
+            The engine's dtype.
+        backend : str
+            Name and version of whatever evaluates the sum; a different one never shares entries.
+        evaluate : Callable[..., Any]
+            Computes a sum over `**ranges` on a miss, and over each missing slab.
+
+        Returns:
+        --------
+        Any:
+            The summation result.
+        '''
+        if any(not isinstance(step, (int, float)) for _, _, step in ranges.values()):
+            # string steps are not grids we can key on
+            return evaluate(expr, **ranges)
+
+        grids = {var: _grid(*ranges[var]) for var in sorted(ranges)}
+        family = _digest(VERSION, _normalize(expr), precision, backend, list(grids))
+        key = _digest(family, list(grids.values()))
+
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        base = self._base(family, grids) if self.incremental else None
+        if base is None:
+            self.misses += 1
+            value = evaluate(expr, **ranges)
+        else:
+            self.extended += 1
+            var, (c_start, step, c_count), value = base
+            start, end, _ = ranges[var]
+            below = (start, c_start - step, step)
+            above = (c_start + c_count * step, end, step)
+            for slab in (below, above):
+                if _grid(*slab)[2] > 0:
+                    value = value + evaluate(expr, **{**ranges, var: slab})
+
+        self._put(key, family, grids, value)
+        return value
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute('DELETE FROM sums')
+
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM sums').fetchone()[0]
+
+
+__all__ = ['SumCache', 'VERSION']
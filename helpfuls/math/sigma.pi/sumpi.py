@@ -1,8 +1,16 @@
+import asyncio
+import threading
 import numpy as np
 from numpy.typing import NDArray
 import numexpr as ne
+from math import prod
+from pathlib import Path
 from multiprocessing import cpu_count
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Iterator
+
+from memo import SumCache, _grid, _integral
+from tasks import Runner, SumFuture, Aborted
 
 # gpu acceleration
 try:
@@ -13,13 +21,38 @@ except ImportError:
     cp = GPU_AVAILABLE = None
     xp = np
 
+# background sums are evaluated this many grid points at a time -- the granularity of progress and cancellation
+BLOCK_POINTS = 1 << 22
+
+
+def _points(ranges: dict[str, tuple]) -> int:
+    return prod(_grid(*r)[2] for r in ranges.values())
+
+
+def _blocks(ranges: dict[str, tuple], size: int) -> Iterator[dict[str, tuple]]:
+    '''
+    `ranges` cut into slabs of about `size` points along its longest variable. Only integer
+    grids are cut (their slab ends are exact); anything else is a single block.
+    '''
+    var = max(ranges, key = lambda v: _grid(*ranges[v])[2])
+    start, end, step = ranges[var]
+    count = _grid(*ranges[var])[2]
+    rows = max(1, size // max(1, _points(ranges) // max(1, count)))
+    if rows >= count or not _integral(start, step) or step <= 0:
+        yield ranges
+        return
+    for i in range(0, count, rows):
+        last = end if i + rows >= count else start + (i + rows - 1) * step
+        yield {**ranges, var: (start + i * step, last, step)}
+
 
 class Sigarette:
     ''' 
     A Class for Optimized Vectorized Summations Using NumPy (CPU), Multi-Threaded NumPy, or CuPy (GPU).
     '''
     
-    def __init__(self, num_workers: int = None, precision: str = 'float32', cuda: bool = False):
+    def __init__(self, num_workers: int = None, precision: str = 'float32', cuda: bool = False, cache: str | Path | SumCache | None = None,
+                 max_concurrent: int = None):
         '''
         Initializes the summation engine with environment settings.
 
@@ -34,6 +67,14 @@ class Sigarette:
 
         cuda : bool, optional
             Whether to enable CUDA acceleration. If True and CUDA is unavailable, raises an error.
+
+        cache : str | Path | SumCache, optional
+            Opt-in on-disk cache of results (see `memo.SumCache`), shared across runs and
+            processes. A path opens a `SumCache` there with the default size.
+
+        max_concurrent : int, optional
+            Sums run at once by `submit` / `compute_async`, across all tenants.
+            If None, as many as fit the cores: `cpu_count() // num_workers`, at least 1.
         
         Raises:
         -------
@@ -46,6 +87,10 @@ class Sigarette:
         
         self.threads = num_workers or cpu_count()
         self.precision = precision
+        self.cache = cache if cache is None or isinstance(cache, SumCache) else SumCache(cache)
+        self.max_concurrent = max_concurrent or max(1, cpu_count() // self.threads)
+        self._runner = None
+        self._runner_lock = threading.Lock()
 
         if cuda:
             if not cp:
@@ -90,9 +135,11 @@ class Sigarette:
             return xp.sum(ne.evaluate(expr, local_dict = {var: chunk[i] for i, var in enumerate(grid.keys())}))
 
         if self.threads > 1:
-            split_mesh = xp.array_split(xp.stack(mesh, axis = 0), self.threads, axis = 1)  # split along major axis
-            
-            with ProcessPoolExecutor(max_workers = self.threads) as executor:
+            # the mesh is sparse, so split the first variable along its axis and keep the rest whole
+            split_mesh = [(part, *mesh[1:]) for part in xp.array_split(mesh[0], self.threads, axis = 0) if part.size]
+
+            # numexpr releases the GIL, so threads run the chunks in parallel
+            with ThreadPoolExecutor(max_workers = self.threads) as executor:
                 results = executor.map(chunked_sum, split_mesh)
             return sum(results)  # aggregate results
 
@@ -193,7 +240,118 @@ class Sigarette:
             return self._matrix_gpu(expr, *M) if xp is cp else self._matrix_cpu(expr, *M)
 
         self._validate_ranges(**ranges)
-        return self._compute_gpu(expr, **ranges) if xp is cp else self._compute_cpu(expr, **ranges)
+        return self._sum(expr, ranges)
+
+
+    def _sum(self, expr: str, ranges: dict[str, tuple], aborted: threading.Event = None,
+             progress: Callable[[float], None] = None) -> float | int:
+        '''
+        The summation, through the cache if there is one. With `aborted` or `progress` it is
+        evaluated block by block, checking `aborted` and reporting the fraction done between blocks.
+        '''
+        evaluate = self._compute_gpu if xp is cp else self._compute_cpu
+        if aborted is not None or progress is not None:
+            evaluate = self._in_blocks(evaluate, _points(ranges), aborted, progress)
+
+        if self.cache is None:
+            result = evaluate(expr, **ranges)
+        else:
+            result = self.cache.sum(expr, ranges, self.precision, self._backend(), evaluate)
+        if progress is not None:
+            progress(1.0)
+        return result
+
+
+    @staticmethod
+    def _in_blocks(evaluate: Callable, total: int, aborted: threading.Event | None,
+                   progress: Callable[[float], None] | None) -> Callable:
+        done = 0
+
+        # the cache may call this for a couple of slabs of the query; `done` counts across them
+        def blocked(expr: str, **ranges: dict[str, tuple]) -> float | int:
+            nonlocal done
+            result = None
+            for block in _blocks(ranges, BLOCK_POINTS):
+                if aborted is not None and aborted.is_set():
+                    raise Aborted('summation cancelled')
+                part = evaluate(expr, **block)
+                result = part if result is None else result + part
+                done += _points(block)
+                if progress is not None and done < total:
+                    progress(done / total)
+            return result
+
+        return blocked
+
+
+    def submit(self, expr: str, *M: tuple[NDArray, ...], progress: Callable[[float], None] = None,
+               tenant: Hashable = None, **ranges: dict[str, tuple]) -> SumFuture:
+        '''
+        Starts `compute(expr, *M, **ranges)` in the background and returns its future.
+
+        Parameters:
+        -----------
+        expr, *M, **ranges :
+            As for `compute` (so no variable can be called `progress` or `tenant`).
+
+        progress : Callable[[float], None], optional
+            Called from the worker thread with the fraction of the index space done,
+            after every block of `BLOCK_POINTS` points and once with 1.0 at the end.
+
+        tenant : Hashable, optional
+            Who the sum is for. Queued sums start round-robin across tenants, at most
+            `max_concurrent` at a time.
+
+        Returns:
+        --------
+        SumFuture:
+            A `concurrent.futures.Future`; `cancel()` also stops a running sum at its next block,
+            and `result()` then raises `CancelledError`.
+        '''
+        if M:
+            job = lambda aborted: self.compute(expr, *M)
+        else:
+            self._validate_ranges(**ranges)
+            job = lambda aborted: self._sum(expr, ranges, aborted, progress)
+
+        with self._runner_lock:
+            if self._runner is None:
+                self._runner = Runner(self.max_concurrent)
+            return self._runner.submit(job, tenant)
+
+
+    async def compute_async(self, expr: str, *M: tuple[NDArray, ...], progress: Callable[[float], None] = None,
+                            tenant: Hashable = None, **ranges: dict[str, tuple]) -> float | int | NDArray:
+        '''
+        `submit` for asyncio: awaits the sum without blocking the event loop. Cancelling the
+        awaiting task cancels the sum. `progress` is still called from the worker thread
+        (use `loop.call_soon_threadsafe` to touch loop state from it).
+        '''
+        return await asyncio.wrap_future(self.submit(expr, *M, progress = progress, tenant = tenant, **ranges))
+
+
+    def close(self, wait: bool = True, cancel: bool = False) -> None:
+        '''Shuts the background runner down: queued sums still run unless `cancel`.'''
+        with self._runner_lock:
+            runner, self._runner = self._runner, None
+        if runner is not None:
+            runner.close(wait = wait, cancel = cancel)
+
+
+    def __enter__(self) -> 'Sigarette':
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close(cancel = exc[0] is not None)
+
+
+    @staticmethod
+    def _backend() -> str:
+        '''Name and version of what evaluates sums, so cached results never cross backends.'''
+        if xp is cp:
+            return f'cupy {cp.__version__}'
+        return f'numexpr {ne.__version__} numpy {np.__version__}'
 
 
 
@@ -201,7 +359,9 @@ if __name__ == '__main__':
 
     from time import time
 
-    expr = '(xp.sin(x * 0.01) * xp.cos(y * 0.01) + xp.log1p(x) - ((x + y) ** 1.5) * 0.00000001) / 10_000'
+    # numexpr (the CPU path) takes bare function names; the CuPy path evals Python with `xp` bound to cupy
+    expr = '(sin(x * 0.01) * cos(y * 0.01) + log1p(x) - ((x + y) ** 1.5) * 0.00000001) / 10_000'
+    gpu_expr = '(xp.sin(x * 0.01) * xp.cos(y * 0.01) + xp.log1p(x) - ((x + y) ** 1.5) * 0.00000001) / 10_000'
     depth = (1, 700, 1)
 
     # list comprehension
@@ -219,6 +379,78 @@ if __name__ == '__main__':
     print(f"CPU (Single-Threaded) Result: {result_cpu:,.2f} | Time: {cpu_single_time:.4f} seconds")
 
 
+    # cpu 1 thread, cached on disk: a second run is a lookup, a longer range only sums the new slab
+    import tempfile
+    with tempfile.TemporaryDirectory() as folder:
+        engine = Sigarette(num_workers = 1, precision = 'float64', cache = folder)
+        summand = '(sin(x * 0.01) * cos(y * 0.01) + log1p(x) - ((x + y) ** 1.5) * 0.00000001) / 10_000'
+        short, longer = (1, 2000, 1), (1, 4000, 1)
+
+        start = time()
+        cold = engine.compute(summand, x = short, y = short)
+        cold_time = time() - start
+        start = time()
+        warm = engine.compute(summand.replace(' ', ''), y = short, x = short)
+        warm_time = time() - start
+        start = time()
+        extended = engine.compute(summand, x = longer, y = short)
+        extended_time = time() - start
+
+        direct = Sigarette(num_workers = 1, precision = 'float64').compute(summand, x = longer, y = short)
+        assert warm == cold and engine.cache.hits == 1 and engine.cache.extended == 1
+        assert abs(extended - direct) <= 1e-9 * abs(direct), (extended, direct)
+        print(f"CPU (Cached) Cold: {cold_time:.4f} s | Warm: {warm_time * 1e3:.2f} ms | "
+              f"x doubled: {extended_time:.4f} s (sum {extended:,.2f} == direct {direct:,.2f})")
+
+
+    # cpu 1 thread in the background: futures, progress, cancellation between blocks, asyncio
+    from concurrent.futures import CancelledError
+    summand = 'sin(x * 0.01) * cos(y * 0.01) + log1p(x) / 10_000'
+    with Sigarette(num_workers = 1, precision = 'float64', max_concurrent = 1) as engine:
+        seen = []
+        future = engine.submit(summand, progress = seen.append, x = (1, 6000, 1), y = (1, 2000, 1))
+        result = future.result()
+        assert abs(result - engine.compute(summand, x = (1, 6000, 1), y = (1, 2000, 1))) <= 1e-9 * abs(result)
+        assert len(seen) > 2 and seen == sorted(seen) and seen[-1] == 1.0
+        print(f"CPU (Future) Result: {result:,.2f} | {len(seen)} progress reports")
+
+        # one worker: tenant b's single sum runs right after a's first, not after all of a's
+        # (the worker is held in a two-block sum until everything is queued)
+        started, gate = [], threading.Event()
+        held = engine.submit(summand, tenant = 'z', progress = lambda f: gate.wait(), x = (1, 3000, 1), y = (1, 2000, 1))
+        jobs = [engine.submit(summand, tenant = t, progress = lambda f, t = t: f == 1.0 and started.append(t), x = (1, 300, 1), y = (1, 300, 1))
+                for t in 'aaab']
+        gate.set()
+        [job.result() for job in [held, *jobs]]
+        assert started == ['a', 'b', 'a', 'a'], started
+
+        halfway = threading.Event()
+        future = engine.submit(summand, progress = lambda f: halfway.set(), x = (1, 10 ** 6, 1), y = (1, 2000, 1))
+        halfway.wait()
+        start = time()
+        assert future.cancel()
+        try:
+            future.result()
+            raise AssertionError("cancelled sum returned")
+        except CancelledError:
+            print(f"CPU (Future) 2e9-point sum cancelled mid-run, stopped {(time() - start) * 1e3:.0f} ms later")
+
+        async def service():
+            ticks = 0
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            beat = asyncio.create_task(ticker())
+            results = await asyncio.gather(*(engine.compute_async(summand, tenant = t, x = (1, 3000, 1), y = (1, 2000, 1)) for t in range(3)))
+            beat.cancel()
+            return results, ticks
+        results, ticks = asyncio.run(service())
+        assert len(set(results)) == 1 and ticks > 5
+        print(f"CPU (asyncio) 3 sums awaited, event loop ticked {ticks} times meanwhile")
+
+
     # cpu 8 threads
     start = time()
     engine = Sigarette(num_workers = 8, precision = 'float32')
@@ -227,8 +459,11 @@ if __name__ == '__main__':
     print(f"CPU (Multi-Threaded) Result: {result_cpu:,.2f} | Time: {cpu_multi_time:.4f} seconds")
 
     # gpu
-    start = time()
-    engine = Sigarette(precision = 'float32', cuda = True)
-    result_gpu = engine.compute(expr, x = depth, y = depth)
-    gpu_time = time() - start
-    print(f"GPU (CuPy) Result: {result_gpu:,.2f} | Time: {gpu_time:.4f} seconds")
\ No newline at end of file
+    if GPU_AVAILABLE:
+        start = time()
+        engine = Sigarette(precision = 'float32', cuda = True)
+        result_gpu = engine.compute(gpu_expr, x = depth, y = depth)
+        gpu_time = time() - start
+        print(f"GPU (CuPy) Result: {result_gpu:,.2f} | Time: {gpu_time:.4f} seconds")
+    else:
+        print("GPU (CuPy) skipped: CuPy or CUDA not available")
\ No newline at end of file
@@ -0,0 +1,154 @@
+'''
+Background execution for `Sigarette.submit` / `Sigarette.compute_async`.
+
+`Runner` is a small thread pool with two things `ThreadPoolExecutor` lacks:
+
+    - fairness: jobs queue per tenant, and a free worker serves the tenant with the fewest
+      running jobs, least recently served first -- so one tenant's hundred sums don't
+      hold back another's single one
+    - cancellation of running jobs: every job gets the `threading.Event` of its
+      `SumFuture`, and `SumFuture.cancel()` sets it -- the sum checks it between blocks
+
+Threads are enough: numexpr and cupy release the GIL while they work, and the pool's
+size is the concurrency limit.
+'''
+
+import threading
+from collections import deque
+from concurrent.futures import Future, CancelledError
+from typing import Any, Callable, Hashable
+
+
+class Aborted(CancelledError):
+    '''Raised inside a job whose future was cancelled while it ran.'''
+
+
+class SumFuture(Future):
+    '''
+    A `concurrent.futures.Future` whose `cancel()` also stops a running job.
+
+    A pending job is cancelled as usual. A running one is asked to stop at its next
+    block: `cancel()` returns True and the future ends with `Aborted` (a `CancelledError`),
+    which `result()` raises -- though `cancelled()` stays False, as `Future` has no way to
+    move a running future to cancelled.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.aborted = threading.Event()
+
+
+    def cancel(self) -> bool:
+        if super().cancel():
+            return True
+        if self.done():
+            return False
+        self.aborted.set()
+        return True
+
+
+class Runner:
+    '''
+    Runs `job(aborted)` callables on at most `workers` threads, fairly across tenants.
+
+    Parameters:
+    -----------
+    workers : int
+        Jobs running at once, over all tenants.
+    '''
+
+    def __init__(self, workers: int):
+        if workers < 1:
+            raise ValueError(f'workers must be at least 1, got {workers}.')
+        self.workers = workers
+        self._queues: dict[Hashable, deque] = {}   # tenant -> its queued jobs
+        self._active: dict[Hashable, int] = {}     # tenant -> its running jobs
+        self._served: dict[Hashable, int] = {}     # tenant -> turn it last started a job, while it has jobs
+        self._turn = 0
+        self._ready = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._running: set[SumFuture] = set()
+        self._closed = False
+
+
+    def submit(self, job: Callable[[threading.Event], Any], tenant: Hashable = None) -> SumFuture:
+        future = SumFuture()
+        with self._ready:
+            if self._closed:
+                raise RuntimeError('cannot submit to a closed Runner')
+            self._queues.setdefault(tenant, deque()).append((future, job))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target = self._work, name = f'sigarette-{len(self._threads)}', daemon = True)
+                self._threads.append(thread)
+                thread.start()
+            self._ready.notify()
+        return future
+
+
+    def _next(self) -> tuple[Hashable, SumFuture, Callable] | None:
+        with self._ready:
+            while not self._queues:
+                if self._closed:
+                    return None
+                self._ready.wait()
+            tenant = min(self._queues, key = lambda t: (self._active.get(t, 0), self._served.get(t, -1)))
+            queue = self._queues[tenant]
+            future, job = queue.popleft()
+            if not queue:
+                del self._queues[tenant]
+            self._turn += 1
+            self._served[tenant] = self._turn
+            self._active[tenant] = self._active.get(tenant, 0) + 1
+            return tenant, future, job
+
+
+    def _work(self) -> None:
+        while (item := self._next()) is not None:
+            tenant, future, job = item
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                with self._ready:
+                    self._running.add(future)
+                try:
+                    result = job(future.aborted)
+                except BaseException as error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            finally:
+                with self._ready:
+                    self._running.discard(future)
+                    self._active[tenant] -= 1
+                    if not self._active[tenant] and tenant not in self._queues:
+                        del self._active[tenant], self._served[tenant]
+
+
+    def pending(self) -> dict[Hashable, int]:
+        '''Queued (not yet running) jobs per tenant.'''
+        with self._ready:
+            return {tenant: len(queue) for tenant, queue in self._queues.items()}
+
+
+    def close(self, wait: bool = True, cancel: bool = False) -> None:
+        '''
+        Stops taking jobs. Queued jobs still run unless `cancel`, which cancels them and
+        asks the running ones to stop at their next block.
+        '''
+        with self._ready:
+            self._closed = True
+            if cancel:
+                for queue in self._queues.values():
+                    for future, _ in queue:
+                        future.cancel()
+                self._queues.clear()
+                for future in self._running:
+                    future.cancel()
+            self._ready.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+__all__ = ['Runner', 'SumFuture', 'Aborted']
@@ -0,0 +1,130 @@
+import re
+import math
+from time import perf_counter
+from typing import Callable
+from dataclasses import dataclass
+import re_cheatsheet
+
+# ======================================================
+#  - ADVERSARIAL INPUTS -
+# ======================================================
+
+# Each generator builds an input of (about) n characters aimed at making one kind
+# of pattern retry a long scan from many start positions. Nothing here is specific
+# to one pattern -- every pattern gets every input.
+ADVERSARIAL: dict[str, Callable[[int], str]] = {
+    'open brackets':        lambda n: '[' * n,                  # [[[[ ... never closed
+    'bracket-paren':        lambda n: '[](' * (n // 3),         # [](  [](  ... link with no ')'
+    'text-bracket-paren':   lambda n: '[a](' * (n // 4),        # [a]( [a]( ... lazy text re-extends past every ']('
+    'open angles':          lambda n: '<' * n,                  # <<<< ... tag never closed
+    'angle-text':           lambda n: '<a ' * (n // 3),
+    'stars':                lambda n: '*' * n,
+    'star-text':            lambda n: '*a' * (n // 2) + 'b',
+    'double-star-text':     lambda n: '**a' * (n // 3),
+    'double-star-single':   lambda n: '**' + 'a*' * (n // 2),
+    'backticks':            lambda n: '``a' * (n // 3),
+    'open fence':           lambda n: '```' + 'a' * n,
+    'hashes':               lambda n: '#' * n + 'x',
+    'dashes':               lambda n: '-' * n + 'x',
+    'spaced hashes':        lambda n: '# ' * (n // 2) + 'x',
+}
+
+
+@dataclass
+class Scaling:
+    pattern: str
+    input: str
+    sizes: list[int]
+    seconds: list[float]
+
+    @property
+    def exponent(self) -> float:
+        '''Empirical growth exponent k in t ~ n^k, from the two largest sizes.'''
+        (n0, t0), (n1, t1) = zip(self.sizes[-2:], self.seconds[-2:])
+        return math.log(max(t1, 1e-9) / max(t0, 1e-9)) / math.log(n1 / n0)
+
+
+def scaling(pattern: re.Pattern, gen: Callable[[int], str], start: int = 512, stop: int = 65_536, budget: float = 0.25) -> tuple[list[int], list[float]]:
+    '''
+    Times `pattern.sub('', gen(n))` for doubling n until n reaches `stop` or one run exceeds `budget` seconds.
+
+    The budget is what keeps a cubic pattern from hanging the audit: the slowest
+    run is at most ~8x the budget. Each size is timed best-of-3 to tame noise.
+    '''
+    sizes, seconds = [], []
+    n = start
+    while n <= stop:
+        text = gen(n)
+        best = math.inf
+        for _ in range(3):
+            t = perf_counter()
+            pattern.sub('', text)
+            best = min(best, perf_counter() - t)
+            if best > budget:
+                break
+        sizes.append(n)
+        seconds.append(best)
+        if best > budget:
+            break
+        n *= 2
+    return sizes, seconds
+
+
+def audit(patterns: dict[str, re.Pattern], threshold: float = 1.3, min_seconds: float = 0.02, **kw) -> list[Scaling]:
+    '''
+    Runs every adversarial input against every pattern.
+
+    Parameters:
+    -----------
+    patterns : dict[str, re.Pattern]
+        Name -> compiled pattern.
+    threshold : float
+        Growth exponents above this are flagged as superlinear (1.0 is linear).
+    min_seconds : float
+        Ignore curves whose largest run is faster than this (timer noise).
+
+    Returns:
+    --------
+    list[Scaling]
+        Only the flagged (pattern, input) curves.
+    '''
+    flagged = []
+    for name, pattern in patterns.items():
+        for label, gen in ADVERSARIAL.items():
+            sizes, seconds = scaling(pattern, gen, **kw)
+            result = Scaling(name, label, sizes, seconds)
+            if len(sizes) >= 2 and seconds[-1] >= min_seconds and result.exponent > threshold:
+                flagged.append(result)
+    return flagged
+
+
+def cheatsheet(safe: bool = False) -> dict[str, re.Pattern]:
+    '''The cheatsheet patterns (or their `safe_` rewrites) compiled with the flags they are used with.'''
+    names = [name for name in vars(re_cheatsheet) if name.endswith('_pattern') and not name.startswith('safe_')]
+    return {
+        name: re.compile(getattr(re_cheatsheet, f'safe_{name}' if safe and hasattr(re_cheatsheet, f'safe_{name}') else name), re.MULTILINE)
+        for name in names
+    }
+
+
+__all__ = ['ADVERSARIAL', 'Scaling', 'scaling', 'audit', 'cheatsheet']
+
+
+
+if __name__ == '__main__':
+    import sys
+
+    def report(title: str, patterns: dict[str, re.Pattern]) -> list[Scaling]:
+        print(f'\n[AUDIT] {title}')
+        flagged = audit(patterns)
+        for s in flagged:
+            curve = ', '.join(f'{n}:{t * 1e3:.1f}ms' for n, t in zip(s.sizes, s.seconds))
+            print(f'  [SUPERLINEAR] {s.pattern:<26} {s.input:<20} n^{s.exponent:.2f}  ({curve})')
+        if not flagged:
+            print('  [OK] every pattern scaled linearly on every input')
+        return flagged
+
+    from re_lib import SCANNER, SAFE_SCANNER
+
+    report('original patterns', cheatsheet() | {'re_lib.SCANNER': SCANNER})
+    sys.exit(1 if report('safe patterns', cheatsheet(safe = True) | {'re_lib.SAFE_SCANNER': SAFE_SCANNER}) else 0)
@@ -56,6 +56,29 @@ bold_italic_pattern = r"\*\*(.*?)\*\*|\*(.*?)\*"
 # - Horizontal rules made of three or more dashes (---) or asterisks (***)
 horizontal_rule_pattern = r"^-{3,}$|^\*{3,}$"
 
+# ======================================================
+#  - SAFE (LINEAR-TIME) VARIANTS FOR UNTRUSTED TEXT -
+# ======================================================
+
+# `re` retries a failed match from every start position, so a pattern whose
+# failing attempt scans to the end of the line (or the text) goes quadratic on
+# input like "<<<<..." -- or cubic when two lazy `.*?` can re-extend past each
+# other, as in "[a]([a]([a](...". Run `python re_audit.py` to measure.
+#
+# Fix: never let a scan run past the next possible *opener*. A negated class that
+# excludes both delimiters stops at the next '<' / '[' / '(', so every character is
+# visited a bounded number of times. The possessive `*+` / `++` (Python 3.11+)
+# additionally forbids giving characters back on failure.
+
+# Same as html_tag_pattern, but a tag cannot contain '<'
+# - "<a <b>" matches "<b>" instead of the whole thing
+safe_html_tag_pattern = r"<[^<>]++>"
+
+# Same as markdown_link_pattern, but link text cannot contain brackets and the URL
+# cannot contain parentheses or newlines
+# - "[a [b](u)" matches "[b](u)"; URLs with literal "(...)" must be percent-encoded
+safe_markdown_link_pattern = r"\[([^\[\]\n]*+)\]\(([^()\n]*+)\)"
+
 '''
 # ==============================
 #        REGEX CHEAT SHEET
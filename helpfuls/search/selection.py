@@ -0,0 +1,572 @@
+'''
+Selection for quickselect.ipynb's `quickselect`: many order statistics per call, no O(n^2) inputs.
+
+    - introselect:  in-place, iterative multi-k selection. Each range is split by a three-way
+                    partition around a median-of-three / ninther pivot and only the sides that
+                    still hold a wanted k are pushed back on the stack, so nine deciles cost about
+                    three medians, not nine. A range that keeps
+                    partitioning badly (2*log2(n) rounds) switches to median-of-medians pivots:
+                    O(n) worst case, no recursion on the data.
+    - select:       the k-th smallest values for a list of k, leaving the input alone; plain
+                    numeric data goes through `np.partition(kth = ks)` instead.
+    - percentiles:  numpy-compatible percentiles ('linear', 'lower', 'higher', 'nearest').
+    - KLL:          a streaming quantile sketch (Karnin, Lang & Liberty) for data that does not
+                    fit in memory: O(k log(n / k)) items kept, mergeable across chunks or processes.
+
+`quickselect` keeps the notebook signature.
+
+Run this file directly for tests and a benchmark against the notebook version and numpy.
+'''
+
+import math
+import random
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import TypeVar, Callable, Iterable, Any, Literal
+from collections.abc import Sequence, MutableSequence
+
+# numpy is optional -- without it everything takes the pure-Python path
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+T = TypeVar('T', int, float, str)
+
+INSERTION_CUTOFF = 16   # ranges this small are insertion-sorted instead of partitioned
+NINTHER_CUTOFF = 128    # ranges larger than this pick the pivot by ninther, not median-of-three
+
+Method = Literal['linear', 'lower', 'higher', 'nearest']
+
+
+''' NUMERIC FAST PATH '''
+
+def _numeric(a: Sequence):
+    '''`a` as a numpy array if it is plain numeric data (an ndarray, or an all-int / all-float list), else None.'''
+    if np is None:
+        return None
+    if isinstance(a, np.ndarray):
+        return a if a.dtype.kind in 'iufb' else None
+    if isinstance(a, (list, tuple)) and a:
+        first = type(a[0])
+        # all-int or all-float only: a mix would round large ints through float64
+        if first in (int, float) and all(type(x) is first for x in a):
+            arr = np.asarray(a)
+            return arr if arr.dtype.kind in 'if' else None  # ints past int64 come back as objects
+    return None
+
+
+def _normalize(ks: Iterable[int], n: int) -> list[int]:
+    '''Wrapped (negative k counts from the end), bounds-checked ks.'''
+    out = []
+    for k in ks:
+        k = k + n if k < 0 else k
+        if not 0 <= k < n:
+            raise ValueError('k is out of bounds of the input list.')
+        out.append(k)
+    return out
+
+
+''' INTROSELECT '''
+
+def _insertion(keys: list, vals: list | None, lo: int, hi: int) -> None:
+    '''Insertion sort of keys[lo:hi + 1].'''
+    for i in range(lo + 1, hi + 1):
+        k = keys[i]
+        v = vals[i] if vals is not None else None
+        j = i - 1
+        while j >= lo and k < keys[j]:
+            keys[j + 1] = keys[j]
+            if vals is not None:
+                vals[j + 1] = vals[j]
+            j -= 1
+        keys[j + 1] = k
+        if vals is not None:
+            vals[j + 1] = v
+
+
+def _median3(keys: list, a: int, b: int, c: int) -> int:
+    '''Index of the median of keys[a], keys[b], keys[c].'''
+    if keys[a] < keys[b]:
+        return b if keys[b] < keys[c] else c if keys[a] < keys[c] else a
+    return a if keys[a] < keys[c] else c if keys[b] < keys[c] else b
+
+
+def _median_of_medians(keys: list, lo: int, hi: int):
+    '''
+    BFPRT pivot for keys[lo:hi + 1]: the median of the medians of groups of five.
+
+    At least 3/10 of the range lies on either side of it, which is what bounds the
+    fallback to O(n). The medians are selected with `_introselect` itself, whose own
+    fallback keeps that linear too.
+    '''
+    medians = [sorted(keys[i : min(i + 5, hi + 1)])[(min(5, hi + 1 - i) - 1) // 2] for i in range(lo, hi + 1, 5)]
+    m = (len(medians) - 1) // 2
+    _introselect(medians, None, [m])
+    return medians[m]
+
+
+def _introselect(keys: list, vals: list | None, ks: list[int]) -> None:
+    '''
+    Rearranges keys (and vals alongside) so that keys[k] is the k-th smallest for every k in `ks`
+    (sorted, unique, in range), with smaller keys before each and larger ones after.
+    '''
+    budget = 2 * len(keys).bit_length()
+    stack = [(0, len(keys) - 1, 0, len(ks), budget)]
+
+    while stack:
+        lo, hi, klo, khi, depth = stack.pop()
+
+        if hi - lo < INSERTION_CUTOFF:
+            _insertion(keys, vals, lo, hi)
+            continue
+
+        if depth > 0:
+            mid = (lo + hi) // 2
+            if hi - lo > NINTHER_CUTOFF:
+                # Tukey's ninther: median of three medians-of-three, robust to organ pipes and sawtooths
+                step = (hi - lo) // 8
+                p = _median3(keys, _median3(keys, lo, lo + step, lo + 2 * step), _median3(keys, mid - step, mid, mid + step), _median3(keys, hi - 2 * step, hi - step, hi))
+            else:
+                p = _median3(keys, lo, mid, hi)
+            pivot = keys[p]
+        else:
+            # this range has split badly too often: guaranteed-good pivot from here on
+            pivot = _median_of_medians(keys, lo, hi)
+
+        # three-way partition: [lo, lt) < pivot, [lt, gt] == pivot, (gt, hi] > pivot.
+        # The pivot block is final, so duplicates never get partitioned twice.
+        lt, i, gt = lo, lo, hi
+        while i <= gt:
+            x = keys[i]
+            if x < pivot:
+                keys[lt], keys[i] = x, keys[lt]
+                if vals is not None:
+                    vals[lt], vals[i] = vals[i], vals[lt]
+                lt += 1
+                i += 1
+            elif pivot < x:
+                keys[gt], keys[i] = x, keys[gt]
+                if vals is not None:
+                    vals[gt], vals[i] = vals[i], vals[gt]
+                gt -= 1
+            else:
+                i += 1
+
+        # only the sides that still hold a wanted k go back on the stack
+        left = bisect_left(ks, lt, klo, khi)
+        right = bisect_right(ks, gt, klo, khi)
+        if left > klo:
+            stack.append((lo, lt - 1, klo, left, depth - 1))
+        if right < khi:
+            stack.append((gt + 1, hi, right, khi, depth - 1))
+
+
+def introselect(a: MutableSequence[T], ks: int | Iterable[int], key: Callable[[T], Any] | None = None) -> None:
+    '''
+    Partially sorts `a` in place so that a[k] is the k-th smallest element for every k in `ks`.
+
+    Like `np.partition(a, kth = ks)`: everything before a[k] is no larger, everything
+    after is no smaller, and nothing else about the order is promised.
+
+    Parameters:
+    -----------
+    a : MutableSequence[T]
+        A list, `array.array` or numpy array.
+    ks : int | Iterable[int]
+        0-based ranks; negative ones count from the end.
+    key : Callable, optional
+        Select by `key(x)`; computed once per element.
+
+    Example:
+    --------
+    >>> a = [3, 6, 8, 1, 9, 2, 5, 4, 7]; introselect(a, [0, 4, 8]); a[0], a[4], a[8]
+    (1, 5, 9)
+
+    Complexity:
+    -----------
+    - O(n log m) average for m distinct ks (O(n) for one), O(n log m) worst case thanks to
+      the median-of-medians fallback; O(m log n) stack instead of recursion.
+    '''
+    ks = sorted(set(_normalize([ks] if isinstance(ks, int) else ks, len(a))))
+    if not ks:
+        return
+
+    if key is None and isinstance(a, np.ndarray if np is not None else ()):
+        a.partition(ks)
+        return
+    if key is None and np is not None and isinstance(a, array) and a.typecode not in 'uw':
+        np.frombuffer(a, dtype = a.typecode).partition(ks)  # a view: partitions the array.array itself
+        return
+
+    if key is None:
+        keys, vals = (a, None) if isinstance(a, list) else (list(a), None)
+    else:
+        keys, vals = [key(x) for x in a], list(a)
+
+    _introselect(keys, vals, ks)
+
+    # an array.array only takes another array of its typecode
+    if key is not None:
+        a[:] = array(a.typecode, vals) if isinstance(a, array) else vals
+    elif keys is not a:
+        a[:] = array(a.typecode, keys) if isinstance(a, array) else keys
+
+
+def select(a: Sequence[T], ks: Iterable[int], key: Callable[[T], Any] | None = None) -> list[T]:
+    '''
+    The k-th smallest elements of `a` for every k in `ks` (in the order given); `a` is not modified.
+
+    Parameters:
+    -----------
+    a : Sequence[T]
+        Any sequence. Plain numeric data (numpy arrays, all-int or all-float lists and
+        tuples) is selected by `np.partition`; the rest by `introselect` on a copy.
+    ks : Iterable[int]
+        0-based ranks; negative ones count from the end. Repeats are fine.
+    key : Callable, optional
+        Select by `key(x)`.
+
+    Example:
+    --------
+    >>> select([3, 6, 8, 1, 9, 2, 5, 4, 7], [0, 4, -1])
+    [1, 5, 9]
+    '''
+    ks = _normalize(ks, len(a))
+    if not ks:
+        return []
+
+    arr = _numeric(a) if key is None else None
+    if arr is not None:
+        picked = np.partition(arr, sorted(set(ks)))[ks]
+        return picked if isinstance(a, np.ndarray) else picked.tolist()
+
+    out = list(a)
+    introselect(out, ks, key)
+    return [out[k] for k in ks]
+
+
+def percentiles(a: Sequence[T], qs: Iterable[float], method: Method = 'linear') -> list:
+    '''
+    Percentiles of `a` for every q in `qs` (0 to 100), with every rank they need selected in one pass.
+
+    Parameters:
+    -----------
+    a : Sequence[T]
+        The data; non-numeric data (strings, ...) needs a method other than 'linear'.
+    qs : Iterable[float]
+        Percentiles in [0, 100].
+    method : {'linear', 'lower', 'higher', 'nearest'}, default='linear'
+        Same meaning as numpy's: the rank is q / 100 * (n - 1), and a fractional rank
+        is interpolated ('linear') or rounded down, up or to the nearest.
+
+    Example:
+    --------
+    >>> percentiles([15, 20, 35, 40, 50], [0, 40, 50, 100])
+    [15.0, 29.0, 35.0, 50.0]
+    '''
+    qs = list(qs)
+    if not len(a):
+        raise ValueError('Percentiles of an empty sequence.')
+    if any(not 0 <= q <= 100 for q in qs):
+        raise ValueError('Percentiles must be in [0, 100].')
+
+    arr = _numeric(a)
+    if arr is not None:
+        return np.percentile(arr, qs, method = method).tolist()
+
+    n = len(a)
+    positions = [q / 100 * (n - 1) for q in qs]
+    if method == 'linear':
+        ranks = [r for pos in positions for r in (math.floor(pos), math.ceil(pos))]
+    elif method in ('lower', 'higher', 'nearest'):
+        pick = {'lower': math.floor, 'higher': math.ceil, 'nearest': round}[method]
+        ranks = [int(pick(pos)) for pos in positions]
+    else:
+        raise ValueError(f'Unknown method {method!r}.')
+
+    out = list(a)
+    introselect(out, ranks)
+    if method != 'linear':
+        return [out[r] for r in ranks]
+    return [out[lo] + (out[hi] - out[lo]) * (pos - lo) for pos, lo, hi in zip(positions, ranks[::2], ranks[1::2])]
+
+
+''' STREAMING SKETCH '''
+
+class KLL:
+    '''
+    KLL quantile sketch: approximate percentiles of a stream in O(k log(n / k)) memory.
+
+    Items land in a buffer at level 0. A full level is sorted and every other item
+    (randomly the odd or the even ones) is promoted to the next level with twice the
+    weight; the rest are dropped. Level capacities shrink by `c` going down from the
+    top, so almost all the memory goes to the few heavy levels that matter most.
+
+    Parameters:
+    -----------
+    k : int, default=200
+        Capacity of the top level; rank error shrinks as about 1 / k.
+    c : float, default=2/3
+        Capacity ratio between neighbouring levels.
+    seed : int, optional
+        Seed for the compaction coin flips (for reproducible results).
+
+    Example:
+    --------
+    >>> sketch = KLL()
+    >>> for chunk in pd.read_csv('latency.csv', chunksize = 1_000_000): sketch.extend(chunk['ms'])
+    >>> sketch.percentiles([50, 99, 99.9])
+
+    Notes:
+    ------
+    - With the defaults, ranks are typically within about 1% of the truth; see the benchmark below.
+    - `merge` combines sketches built on separate chunks (e.g. in worker processes; sketches pickle).
+    '''
+
+    def __init__(self, k: int = 200, c: float = 2 / 3, seed: int | None = None):
+        if k < 8:
+            raise ValueError('k must be at least 8.')
+        self.k = k
+        self.c = c
+        self.n = 0
+        self._levels: list[list] = []
+        self._size = 0
+        self._rng = random.Random(seed)
+        self._grow()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.c ** depth * self.k)))
+
+    def _grow(self) -> None:
+        self._levels.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self._levels)))
+
+    def _compress(self) -> None:
+        while self._size >= self._max_size:
+            for level, items in enumerate(self._levels):
+                if len(items) >= self._capacity(level):
+                    break
+            if level + 1 == len(self._levels):
+                self._grow()
+
+            items.sort()
+            # an odd item out stays behind, so no weight is lost
+            keep = [items.pop()] if len(items) % 2 else []
+            promoted = items[self._rng.random() < 0.5 :: 2]
+            self._levels[level] = keep
+            self._levels[level + 1].extend(promoted)
+            self._size -= len(items) - len(promoted)
+
+    def update(self, x) -> None:
+        '''Adds one item.'''
+        self._levels[0].append(x)
+        self._size += 1
+        self.n += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def extend(self, xs: Iterable) -> None:
+        '''Adds many items (numpy arrays and pandas columns included), a capacity-sized batch at a time.'''
+        if np is not None and hasattr(xs, '__array__'):
+            xs = np.asarray(xs).ravel().tolist()
+        it = iter(xs)
+        while batch := [x for _, x in zip(range(max(1, self._max_size - self._size)), it)]:
+            self._levels[0].extend(batch)
+            self._size += len(batch)
+            self.n += len(batch)
+            self._compress()
+
+    def merge(self, other: 'KLL') -> 'KLL':
+        '''Folds `other` into this sketch (level by level, then compresses) and returns self.'''
+        while len(self._levels) < len(other._levels):
+            self._grow()
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self._size = sum(len(items) for items in self._levels)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted(self) -> tuple[list, list[int]]:
+        '''Retained items in order, with the cumulative weight (approximate rank) up to each.'''
+        pairs = sorted((x, 1 << level) for level, items in enumerate(self._levels) for x in items)
+        values, cumulative, total = [], [], 0
+        for x, weight in pairs:
+            total += weight
+            values.append(x)
+            cumulative.append(total)
+        return values, cumulative
+
+    def rank(self, x) -> float:
+        '''Approximate fraction of the items seen that are <= x.'''
+        weight = sum((1 << level) for level, items in enumerate(self._levels) for y in items if not x < y)
+        return weight / self.n if self.n else 0.0
+
+    def percentiles(self, qs: Iterable[float]) -> list:
+        '''Approximate percentiles (0 to 100, 'lower' method) of the items seen.'''
+        if not self.n:
+            raise ValueError('Percentiles of an empty sketch.')
+        values, cumulative = self._weighted()
+        total = cumulative[-1]
+        return [values[min(len(values) - 1, bisect_left(cumulative, q / 100 * total))] for q in qs]
+
+    def percentile(self, q: float):
+        return self.percentiles([q])[0]
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def retained(self) -> int:
+        '''Items actually held in memory.'''
+        return self._size
+
+
+''' NOTEBOOK API '''
+
+def quickselect(a: Sequence[T], k: int, low: int = None, high: int = None) -> T:
+    '''
+    Finds the k-th smallest element (0-based) of a list or tuple; `a` is not modified.
+
+    With `low` / `high`, only a[low:high + 1] is searched and `k` is still an index
+    into `a`, as in the notebook version.
+
+    Example:
+    --------
+    >>> quickselect([3, 6, 8, 1, 9, 2, 5, 4, 7], 3)
+    4
+
+    >>> quickselect((10.5, 2.3, 8.8, 4.7), 2)
+    8.8
+
+    Complexity:
+    -----------
+    - O(n) average and worst case (the notebook version is O(n^2) on sorted input).
+    '''
+    low = 0 if low is None else low
+    high = len(a) - 1 if high is None else high
+    if not low <= k <= high:
+        raise ValueError('k is out of bounds of the input list.')
+    return select(a[low : high + 1], [k - low])[0]
+
+
+__all__ = ['introselect', 'select', 'percentiles', 'quickselect', 'KLL']
+
+
+
+if __name__ == '__main__':
+    from time import perf_counter
+
+    def quickselect_lomuto(a, k):
+        # quickselect.ipynb's version, for comparison
+        a = list(a)
+        low, high = 0, len(a) - 1
+        while low <= high:
+            pivot, i = a[high], low - 1
+            for j in range(low, high):
+                if a[j] < pivot:
+                    i += 1
+                    a[i], a[j] = a[j], a[i]
+            a[i + 1], a[high] = a[high], a[i + 1]
+            if i + 1 == k:
+                return a[k]
+            low, high = (i + 2, high) if i + 1 < k else (low, i)
+
+    N = 100_000
+    rng = random.Random(0)
+    distributions = {
+        'random':      lambda: [rng.random() for _ in range(N)],
+        'sorted':      lambda: sorted(rng.random() for _ in range(N)),
+        'few unique':  lambda: [rng.randrange(8) for _ in range(N)],
+        'organ pipe':  lambda: list(range(N // 2)) + list(range(N // 2, 0, -1)),
+        'strings':     lambda: [f'{rng.getrandbits(40):x}' for _ in range(N)],
+    }
+    deciles = [N * d // 10 for d in range(1, 10)]
+
+    # correctness: pure-Python and numpy paths against sorted()
+    for name, make in distributions.items():
+        data = make()
+        expected = sorted(data)
+        ks = deciles + [0, N - 1, -1, 17]
+        assert select(data, ks) == [expected[k] for k in ks], name
+        assert select([str(x) for x in data], ks) == [sorted(str(x) for x in data)[k] for k in ks], name
+        part = list(data)
+        introselect(part, deciles)
+        for k in deciles:
+            assert part[k] == expected[k] and max(part[:k], default = part[k]) <= part[k] <= min(part[k + 1 :], default = part[k]), (name, k)
+    for typecode, values, key in (('d', [3.0, 1.0, 2.0], None), ('d', [3.0, 1.0, 2.0], lambda x: -x), ('u', 'select', None), ('q', [5, 9, 1, 7], abs)):
+        part = array(typecode, values)
+        introselect(part, 1, key = key)
+        assert part[1] == sorted(values, key = key)[1], (typecode, key)
+    assert quickselect([3, 6, 8, 1, 9, 2, 5, 4, 7], 3) == 4 and quickselect((10.5, 2.3, 8.8, 4.7), 2) == 8.8
+    assert quickselect(['pear', 'apple', 'orange', 'banana', 'grape'], 2) == 'grape'
+    pairs = [(rng.randrange(100), i) for i in range(2_000)]
+    assert [p[0] for p in select(pairs, [0, 999, 1999], key = lambda p: p[0])] == [sorted(p[0] for p in pairs)[k] for k in (0, 999, 1999)]
+    if np is not None:
+        values = [rng.randrange(1000) for _ in range(1001)]
+        for method in ('linear', 'lower', 'higher', 'nearest'):
+            # the pure-Python path (Fractions are not plain numbers) must agree with numpy
+            from fractions import Fraction
+            fractions = [Fraction(v) for v in values]
+            qs = [0, 12.5, 33.3, 50, 99, 100]
+            assert np.allclose([float(x) for x in percentiles(fractions, qs, method)], np.percentile(values, qs, method = method)), method
+
+    # the fallback's guarantee: the median-of-medians pivot lands in the middle 40% of the ranks
+    for name, make in distributions.items():
+        data = make()
+        mom = _median_of_medians(list(data), 0, len(data) - 1)
+        rank = bisect_left(sorted(data), mom) / len(data)
+        assert 0.29 <= rank <= 0.71 or name == 'few unique', (name, rank)
+    print('[TEST] introselect / select / percentiles agree with sorted() and numpy')
+
+    # KLL: error on a stream, and merge == one sketch over everything
+    stream = [rng.gauss(0, 1) for _ in range(1_000_000)]
+    truth = sorted(stream)
+    qs = [1, 10, 25, 50, 75, 90, 99]
+    whole = KLL(seed = 1)
+    whole.extend(stream)
+    halves = KLL(seed = 2)
+    halves.extend(stream[: len(stream) // 2])
+    other = KLL(seed = 3)
+    other.extend(stream[len(stream) // 2 :])
+    halves.merge(other)
+    for sketch, label in ((whole, 'one pass'), (halves, 'merged')):
+        errors = [abs(bisect_left(truth, v) / len(truth) - q / 100) for v, q in zip(sketch.percentiles(qs), qs)]
+        assert len(sketch) == len(stream) and max(errors) < 0.02, (label, errors)
+        print(f'[TEST] KLL ({label}): n = {len(sketch):,}, {sketch.retained:,} items kept, worst rank error {max(errors):.2%}')
+
+    def bench(fn, data, repeat = 3):
+        best = float('inf')
+        for _ in range(repeat):
+            start = perf_counter()
+            fn(data)
+            best = min(best, perf_counter() - start)
+        return best * 1e3
+
+    columns = {
+        'median':      lambda a: _introselect(list(a), None, [N // 2]),
+        '9 x median':  lambda a: [_introselect(list(a), None, [k]) for k in deciles],
+        'deciles':     lambda a: _introselect(list(a), None, deciles),
+        'sorted()':    sorted,
+        'np.partition': lambda a: np.partition(a, deciles) if np is not None else None,
+    }
+
+    print(f'\n[BENCH] n = {N:,}, ms (best of 3); pure-Python introselect unless noted')
+    print(f"  {'':<11}" + ''.join(f'{label:>13}' for label in columns))
+    for name, make in distributions.items():
+        data = make()
+        row = f'  {name:<11}'
+        for label, fn in columns.items():
+            if label == 'np.partition':
+                row += f'{bench(fn, np.array(data)):13.1f}' if np is not None else f"{'-':>13}"
+            else:
+                row += f'{bench(fn, data, repeat = 1 if label == "9 x median" else 3):13.1f}'
+        print(row)
+
+    # the notebook version against the new one where it hurts: already sorted input
+    small = sorted(rng.random() for _ in range(5_000))
+    print(f'\n[BENCH] sorted input, n = 5,000, median: quickselect.ipynb {bench(lambda a: quickselect_lomuto(a, 2_500), small, 1):.0f} ms, '
+          f'quickselect {bench(lambda a: quickselect(a, 2_500), small):.1f} ms (numpy), '
+          f'introselect {bench(lambda a: _introselect(list(a), None, [2_500]), small):.1f} ms (pure Python)')
@@ -0,0 +1,421 @@
+'''
+In-place sorting for lib.ipynb's `quick_sort` / `merge_sort`.
+
+    - introsort:  in-place quicksort (median-of-three / ninther, Hoare partition, loop on
+                  the larger side) that falls back to heapsort past 2*log2(n) levels -- O(n log n)
+                  worst case and O(log n) stack, so sorted or adversarial input can't
+                  hit RecursionError.
+    - mergesort:  stable bottom-up merge sort; runs of 32 are insertion-sorted, then
+                  merged back and forth between the list and ONE scratch buffer.
+
+Both take `key=` (keys are computed once and sorted alongside the values) and
+take a numpy fast path for plain numeric data: lists of ints or floats, `array.array`
+(sorted in place through a zero-copy view) and numpy arrays.
+
+`quick_sort` / `merge_sort` keep the notebook signatures and return a new list.
+
+Run this file directly for a benchmark against `sorted()` and `np.sort`.
+'''
+
+from typing import TypeVar, Callable, Any
+from collections.abc import Sequence, MutableSequence
+from array import array
+
+# numpy is optional -- without it everything takes the pure-Python path
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+T = TypeVar('T', int, float, str)
+
+INSERTION_CUTOFF = 16   # ranges this small are insertion-sorted by introsort
+NINTHER_CUTOFF = 128    # ranges larger than this pick the pivot by ninther, not median-of-three
+RUN = 32                # initial run length of the bottom-up merge sort
+
+
+''' NUMERIC FAST PATH '''
+
+def _numeric(a: MutableSequence, stable: bool) -> bool:
+    '''
+    Sorts `a` in place with numpy if it is plain numeric data. Returns False (untouched) otherwise.
+    '''
+    if np is None:
+        return False
+
+    kind = 'stable' if stable else 'quicksort'  # numpy's 'quicksort' is an introsort too
+
+    if isinstance(a, np.ndarray):
+        a.sort(kind = kind)
+        return True
+
+    if isinstance(a, array):
+        if a.typecode in 'uw' or not len(a):
+            return False
+        np.frombuffer(a, dtype = a.typecode).sort(kind = kind)  # a view: sorts the array.array itself
+        return True
+
+    if isinstance(a, list) and a:
+        first = type(a[0])
+        # all-int or all-float only: a mix would round large ints through float64
+        if first not in (int, float) or any(type(x) is not first for x in a):
+            return False
+        try:
+            values = np.array(a, dtype = np.int64 if first is int else np.float64)
+        except OverflowError:  # ints beyond int64
+            return False
+        values.sort(kind = kind)
+        a[:] = values.tolist()
+        return True
+
+    return False
+
+
+def _write_back(a: MutableSequence, values: list) -> None:
+    '''`a[:] = values`; an `array.array` only takes another array of its typecode.'''
+    a[:] = array(a.typecode, values) if isinstance(a, array) else values
+
+
+''' INTROSORT '''
+
+def _insertion(keys: list, vals: list | None, lo: int, hi: int) -> None:
+    for i in range(lo + 1, hi + 1):
+        k = keys[i]
+        j = i - 1
+        if vals is None:
+            while j >= lo and k < keys[j]:
+                keys[j + 1] = keys[j]
+                j -= 1
+            keys[j + 1] = k
+        else:
+            v = vals[i]
+            while j >= lo and k < keys[j]:
+                keys[j + 1] = keys[j]
+                vals[j + 1] = vals[j]
+                j -= 1
+            keys[j + 1] = k
+            vals[j + 1] = v
+
+
+def _heapsort(keys: list, vals: list | None, lo: int, hi: int) -> None:
+    n = hi - lo + 1
+
+    def sift(root: int, end: int) -> None:
+        while (child := 2 * root + 1) < end:
+            if child + 1 < end and keys[lo + child] < keys[lo + child + 1]:
+                child += 1
+            if not keys[lo + root] < keys[lo + child]:
+                return
+            r, c = lo + root, lo + child
+            keys[r], keys[c] = keys[c], keys[r]
+            if vals is not None:
+                vals[r], vals[c] = vals[c], vals[r]
+            root = child
+
+    for start in range(n // 2 - 1, -1, -1):
+        sift(start, n)
+    for end in range(n - 1, 0, -1):
+        keys[lo], keys[lo + end] = keys[lo + end], keys[lo]
+        if vals is not None:
+            vals[lo], vals[lo + end] = vals[lo + end], vals[lo]
+        sift(0, end)
+
+
+def _median3(keys: list, a: int, b: int, c: int) -> int:
+    '''Index of the median of keys[a], keys[b], keys[c].'''
+    if keys[a] < keys[b]:
+        return b if keys[b] < keys[c] else c if keys[a] < keys[c] else a
+    return a if keys[a] < keys[c] else c if keys[b] < keys[c] else b
+
+
+def _introsort(keys: list, vals: list | None, lo: int, hi: int, depth: int) -> None:
+    while hi - lo > INSERTION_CUTOFF:
+        if depth == 0:
+            _heapsort(keys, vals, lo, hi)
+            return
+        depth -= 1
+
+        mid = (lo + hi) // 2
+        if hi - lo > NINTHER_CUTOFF:
+            # Tukey's ninther: median of three medians-of-three, robust to organ pipes and sawtooths
+            step = (hi - lo) // 8
+            p = _median3(keys, _median3(keys, lo, lo + step, lo + 2 * step), _median3(keys, mid - step, mid, mid + step), _median3(keys, hi - 2 * step, hi - step, hi))
+        else:
+            p = _median3(keys, lo, mid, hi)
+        # park the pivot in the middle slot (Hoare partition must not pick the last element)
+        keys[p], keys[mid] = keys[mid], keys[p]
+        if vals is not None:
+            vals[p], vals[mid] = vals[mid], vals[p]
+        pivot = keys[mid]
+
+        # Hoare partition: stops on equal keys, so runs of duplicates split evenly
+        i, j = lo - 1, hi + 1
+        while True:
+            i += 1
+            while keys[i] < pivot:
+                i += 1
+            j -= 1
+            while pivot < keys[j]:
+                j -= 1
+            if i >= j:
+                break
+            keys[i], keys[j] = keys[j], keys[i]
+            if vals is not None:
+                vals[i], vals[j] = vals[j], vals[i]
+
+        # recurse into the smaller half, loop on the larger: O(log n) stack
+        if j - lo < hi - j - 1:
+            _introsort(keys, vals, lo, j, depth)
+            lo = j + 1
+        else:
+            _introsort(keys, vals, j + 1, hi, depth)
+            hi = j
+
+    _insertion(keys, vals, lo, hi)
+
+
+def introsort(a: MutableSequence[T], key: Callable[[T], Any] | None = None) -> None:
+    '''
+    Sorts `a` in place with introsort (not stable).
+
+    Parameters:
+    -----------
+    a : MutableSequence[T]
+        A list, `array.array` or numpy array.
+    key : Callable, optional
+        Sort by `key(x)`; computed once per element.
+
+    Example:
+    --------
+    >>> a = [5, 3, 9, 1, 7]; introsort(a); a
+    [1, 3, 5, 7, 9]
+
+    Complexity:
+    -----------
+    - O(n log n) worst case, O(log n) extra space (O(n) for the keys when `key` is given).
+    '''
+    if len(a) < 2 or (key is None and _numeric(a, stable = False)):
+        return
+
+    if key is None:
+        keys, vals = (a, None) if isinstance(a, list) else (list(a), None)
+    else:
+        keys, vals = [key(x) for x in a], list(a)
+
+    _introsort(keys, vals, 0, len(keys) - 1, 2 * len(keys).bit_length())
+
+    if key is not None:
+        _write_back(a, vals)
+    elif keys is not a:
+        _write_back(a, keys)
+
+
+''' MERGESORT '''
+
+def _merge_into(src_k: list, src_v: list | None, dst_k: list, dst_v: list | None, lo: int, mid: int, hi: int) -> None:
+    '''Stable merge of src[lo:mid] and src[mid:hi] into dst[lo:hi].'''
+    i, j, out = lo, mid, lo
+
+    # already in order: just copy across
+    if mid >= hi or not src_k[mid] < src_k[mid - 1]:
+        dst_k[lo:hi] = src_k[lo:hi]
+        if dst_v is not None:
+            dst_v[lo:hi] = src_v[lo:hi]
+        return
+
+    while i < mid and j < hi:
+        if src_k[j] < src_k[i]:  # strict: ties take the left element, which keeps it stable
+            dst_k[out] = src_k[j]
+            if dst_v is not None: dst_v[out] = src_v[j]
+            j += 1
+        else:
+            dst_k[out] = src_k[i]
+            if dst_v is not None: dst_v[out] = src_v[i]
+            i += 1
+        out += 1
+
+    if i < mid:
+        dst_k[out:hi] = src_k[i:mid]
+        if dst_v is not None: dst_v[out:hi] = src_v[i:mid]
+    else:
+        dst_k[out:hi] = src_k[j:hi]
+        if dst_v is not None: dst_v[out:hi] = src_v[j:hi]
+
+
+def _binary_insertion(keys: list, vals: list | None, lo: int, hi: int) -> None:
+    '''Stable insertion sort of keys[lo:hi] with binary search for the slot.'''
+    from bisect import bisect_right
+    for i in range(lo + 1, hi):
+        k = keys[i]
+        if not k < keys[i - 1]:
+            continue
+        at = bisect_right(keys, k, lo, i)
+        keys[at + 1 : i + 1] = keys[at:i]
+        keys[at] = k
+        if vals is not None:
+            v = vals[i]
+            vals[at + 1 : i + 1] = vals[at:i]
+            vals[at] = v
+
+
+def mergesort(a: MutableSequence[T], key: Callable[[T], Any] | None = None) -> None:
+    '''
+    Sorts `a` in place with a stable bottom-up merge sort.
+
+    Parameters:
+    -----------
+    a : MutableSequence[T]
+        A list, `array.array` or numpy array.
+    key : Callable, optional
+        Sort by `key(x)`; computed once per element.
+
+    Example:
+    --------
+    >>> a = [('b', 1), ('a', 2), ('b', 0)]; mergesort(a, key = lambda p: p[0]); a
+    [('a', 2), ('b', 1), ('b', 0)]
+
+    Complexity:
+    -----------
+    - O(n log n) time; one n-sized scratch buffer (two with `key`) for the whole sort.
+    '''
+    n = len(a)
+    if n < 2 or (key is None and _numeric(a, stable = True)):
+        return
+
+    keys = a if key is None and isinstance(a, list) else [key(x) for x in a] if key is not None else list(a)
+    vals = list(a) if key is not None else None
+
+    for lo in range(0, n, RUN):
+        _binary_insertion(keys, vals, lo, min(lo + RUN, n))
+
+    # ping-pong between the data and the scratch buffer: no per-level allocation
+    scratch_k, scratch_v = [None] * n, [None] * n if vals is not None else None
+    src_k, src_v, dst_k, dst_v = keys, vals, scratch_k, scratch_v
+    width = RUN
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            _merge_into(src_k, src_v, dst_k, dst_v, lo, min(lo + width, n), min(lo + 2 * width, n))
+        src_k, src_v, dst_k, dst_v = dst_k, dst_v, src_k, src_v
+        width *= 2
+
+    # src now holds the sorted data
+    if key is not None:
+        _write_back(a, src_v)
+    elif src_k is not a:
+        _write_back(a, src_k)
+
+
+''' NOTEBOOK API '''
+
+def quick_sort(a: Sequence[T], key: Callable[[T], Any] | None = None) -> list[T]:
+    '''
+    Returns a new sorted list of `a` (introsort; not stable).
+
+    Example:
+    --------
+    >>> quick_sort((5, 3, 9, 1, 7))
+    [1, 3, 5, 7, 9]
+    '''
+    out = list(a)
+    introsort(out, key)
+    return out
+
+
+def merge_sort(a: Sequence[T], key: Callable[[T], Any] | None = None) -> list[T]:
+    '''
+    Returns a new stably sorted list of `a` (bottom-up merge sort).
+
+    Example:
+    --------
+    >>> merge_sort(('pear', 'apple', 'orange'))
+    ['apple', 'orange', 'pear']
+    '''
+    out = list(a)
+    mergesort(out, key)
+    return out
+
+
+__all__ = ['introsort', 'mergesort', 'quick_sort', 'merge_sort']
+
+
+
+if __name__ == '__main__':
+    import random
+    from time import perf_counter
+
+    def quick_sort_lists(a):
+        # lib.ipynb's version, for comparison
+        if len(a) <= 1:
+            return list(a)
+        pivot = a[len(a) // 2]
+        return quick_sort_lists([x for x in a if x < pivot]) + [x for x in a if x == pivot] + quick_sort_lists([x for x in a if x > pivot])
+
+    N = 100_000
+    rng = random.Random(0)
+    distributions = {
+        'random':      lambda: [rng.random() for _ in range(N)],
+        'sorted':      lambda: sorted(rng.random() for _ in range(N)),
+        'reversed':    lambda: sorted((rng.random() for _ in range(N)), reverse = True),
+        'few unique':  lambda: [rng.randrange(8) for _ in range(N)],
+        'organ pipe':  lambda: list(range(N // 2)) + list(range(N // 2, 0, -1)),
+        'strings':     lambda: [f'{rng.getrandbits(40):x}' for _ in range(N)],
+    }
+
+    # correctness, including key= and stability, on the pure-Python paths
+    for name, make in distributions.items():
+        data = make()
+        expected = sorted(data)
+        for fn in (introsort, mergesort):
+            got = [str(x) for x in data]  # strings: no numpy fast path
+            fn(got)
+            assert got == sorted(str(x) for x in data), (name, fn.__name__)
+        assert quick_sort(data) == expected and merge_sort(data) == expected, name
+    pairs = [(rng.randrange(10), i) for i in range(5_000)]
+    assert merge_sort(pairs, key = lambda p: p[0]) == sorted(pairs, key = lambda p: p[0])  # stable
+    assert [p[0] for p in quick_sort(pairs, key = lambda p: -p[0])] == sorted((p[0] for p in pairs), reverse = True)
+    numbers = array('d', (rng.random() for _ in range(1000)))
+    introsort(numbers)
+    assert list(numbers) == sorted(numbers)
+    from array import typecodes
+    for fn in (introsort, mergesort):
+        # key= and the unicode typecodes go through a list and are written back as an array
+        for typecode, values in (('d', [rng.random() for _ in range(1000)]), ('u', 'introspective'), ('w', 'merge sorted')):
+            if typecode not in typecodes:
+                continue  # 'w' is Python 3.13+
+            got = array(typecode, values)
+            fn(got, key = lambda x: -x if typecode == 'd' else x)
+            assert list(got) == sorted(values, key = lambda x: -x if typecode == 'd' else x), (fn.__name__, typecode)
+            got = array(typecode, values)
+            fn(got)
+            assert list(got) == sorted(values), (fn.__name__, typecode)
+    print('[TEST] introsort / mergesort agree with sorted() (stability and key= included)')
+
+    def bench(fn, data, repeat = 3):
+        best = float('inf')
+        for _ in range(repeat):
+            copy = data.copy()
+            start = perf_counter()
+            fn(copy)
+            best = min(best, perf_counter() - start)
+        return best * 1e3
+
+    columns = {
+        'lib.ipynb': lambda a: quick_sort_lists(a),
+        'introsort': lambda a: _introsort(a, None, 0, len(a) - 1, 2 * len(a).bit_length()),  # pure Python
+        'mergesort': lambda a: mergesort(a, key = lambda x: x),                              # key= skips numpy
+        'fast path': introsort,
+        'sorted()': sorted,
+    }
+
+    print(f'\n[BENCH] n = {N:,}, ms (best of 3)')
+    print(f"  {'':<11}" + ''.join(f'{label:>11}' for label in columns) + f"{'np.sort':>11}")
+    for name, make in distributions.items():
+        data = make()
+        row = f'  {name:<11}'
+        for label, fn in columns.items():
+            try:
+                row += f'{bench(fn, data, repeat = 3 if label in ("fast path", "sorted()") else 1):11.1f}'
+            except RecursionError:
+                row += f"{'Recursion':>11}"
+        row += f'{bench(np.sort, np.array(data)):11.1f}' if np else f"{'-':>11}"
+        print(row)
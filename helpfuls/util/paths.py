@@ -0,0 +1,428 @@
+'''
+Filename index for util.ipynb's `_path`.
+
+`_path` used to walk the whole tree with `rglob` on every call. Here a tree is walked
+once with `os.scandir` into a `FileIndex` (name -> paths), kept per root for the life of
+the process and optionally persisted to a JSON file so the next process starts warm.
+
+Staying correct without re-walking:
+
+    - Every indexed directory keeps the `st_mtime_ns` it had when listed. Creating,
+      deleting or renaming an entry changes its parent directory's mtime, so a refresh
+      only has to stat each directory and re-list the ones that changed.
+    - A refresh runs at most every `ttl` seconds, and also whenever a lookup misses or
+      its answer has disappeared from disk -- so a new or moved file is found at once.
+
+Lookups by exact name are a dict hit; globs on the name use the sorted name list to
+jump to their literal prefix, so both cost O(matches) rather than O(tree).
+'''
+
+import os
+import json
+import threading
+from bisect import bisect_left
+from fnmatch import fnmatchcase
+from pathlib import Path
+from time import monotonic
+from typing import Literal
+
+IGNORE = ('.git', '__pycache__', '.ipynb_checkpoints')  # directories never descended into
+VERSION = 1                                              # persisted index format
+
+Match = Literal['first', 'all', 'unique']
+
+
+def _magic(pattern: str) -> bool:
+    return any(c in pattern for c in '*?[')
+
+
+def _fits(components: list[str], parts: list[str]) -> bool:
+    '''
+    Whether a path's `components` end with the glob `parts`, where a '**' part stands for
+    zero or more components (so '**/x.txt' also matches a top-level x.txt, as with rglob).
+    '''
+    parts = ['**', *parts]  # like rglob, the pattern may start at any depth
+
+    def closure(states: set[int]) -> set[int]:
+        for k in sorted(states):
+            while k < len(parts) and parts[k] == '**':
+                k += 1
+                states.add(k)
+        return states
+
+    states = closure({0})
+    for component in components:
+        states = closure({k for k in states if k < len(parts) and parts[k] == '**'} |
+                         {k + 1 for k in states if k < len(parts) and parts[k] != '**' and fnmatchcase(component, parts[k])})
+        if not states:
+            return False
+    return len(parts) in states
+
+
+class FileIndex:
+    '''
+    Name -> paths index of every file and directory under `root`.
+
+    Parameters:
+    -----------
+    root : str | Path
+        The directory to index.
+    persist : str | Path, optional
+        JSON file to load the index from (then refreshed by mtimes) and save it to.
+    ignore : tuple[str, ...], default=IGNORE
+        Directory names that are neither indexed nor descended into.
+    ttl : float, default=2.0
+        Seconds a lookup trusts the index before re-checking directory mtimes.
+        0 checks on every lookup (one `stat` per directory, still no listing).
+
+    Example:
+    --------
+    >>> idx = FileIndex('~/data')
+    >>> idx.find('config.yaml')
+    [PosixPath('/home/me/data/config.yaml')]
+    >>> idx.find('runs/*/metrics.json')
+    '''
+
+    def __init__(self, root: str | Path, persist: str | Path | None = None, ignore: tuple[str, ...] = IGNORE, ttl: float = 2.0):
+        self.root = Path(root).expanduser().resolve()
+        if not self.root.is_dir():
+            raise NotADirectoryError(f'Not a directory: {self.root}')
+        self.persist = Path(persist) if persist else None
+        self.ignore = frozenset(ignore)
+        self.ttl = ttl
+
+        # relative dir ('' is the root) -> (mtime_ns, subdirectory names, file names)
+        self._dirs: dict[str, tuple[int, list[str], list[str]]] = {}
+        self._names: dict[str, list[str]] = {}   # entry name -> relative paths
+        self._sorted: list[str] | None = None    # sorted entry names, rebuilt lazily
+        self._lock = threading.RLock()
+
+        if not self._load():
+            self._scan('')
+        self.refresh()
+
+    ''' BUILD '''
+
+    def _add(self, name: str, rel: str) -> None:
+        paths = self._names.get(name)
+        if paths is None:
+            self._names[name] = [rel]
+            self._sorted = None
+        else:
+            paths.append(rel)
+
+    def _remove(self, name: str, rel: str) -> None:
+        paths = self._names[name]
+        paths.remove(rel)
+        if not paths:
+            del self._names[name]
+            self._sorted = None
+
+    def _list(self, rel: str) -> None:
+        '''(Re)lists one directory into the index; its subdirectories are left to the caller.'''
+        path = os.path.join(self.root, rel)
+        mtime = os.stat(path).st_mtime_ns  # taken before listing: a change mid-listing shows up next refresh
+        subdirs, files = [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks = False):
+                    if entry.name not in self.ignore:
+                        subdirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        self._dirs[rel] = (mtime, subdirs, files)
+        for name in subdirs + files:
+            self._add(name, f'{rel}/{name}' if rel else name)
+
+    def _scan(self, rel: str) -> None:
+        '''Indexes `rel` and everything below it.'''
+        stack = [rel]
+        while stack:
+            rel = stack.pop()
+            try:
+                self._list(rel)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            stack.extend(f'{rel}/{name}' if rel else name for name in self._dirs[rel][1])
+
+    def _drop(self, rel: str) -> None:
+        '''Forgets `rel` and everything below it.'''
+        stack = [rel]
+        while stack:
+            rel = stack.pop()
+            entry = self._dirs.pop(rel, None)
+            if entry is None:
+                continue
+            _, subdirs, files = entry
+            for name in subdirs + files:
+                self._remove(name, f'{rel}/{name}' if rel else name)
+            stack.extend(f'{rel}/{name}' if rel else name for name in subdirs)
+
+    def _relist(self, rel: str) -> None:
+        _, old_subdirs, old_files = self._dirs[rel]
+        self._list(rel)  # first: if it raises, the index still holds the old listing
+        for name in old_subdirs + old_files:
+            self._remove(name, f'{rel}/{name}' if rel else name)
+
+        new_subdirs = set(self._dirs[rel][1])
+        for name in old_subdirs:
+            if name not in new_subdirs:
+                self._drop(f'{rel}/{name}' if rel else name)
+        for name in new_subdirs.difference(old_subdirs):
+            self._scan(f'{rel}/{name}' if rel else name)
+
+    def refresh(self) -> int:
+        '''
+        Re-lists every directory whose mtime changed (one `stat` per directory otherwise).
+
+        Returns:
+        --------
+        int
+            Directories re-listed.
+        '''
+        with self._lock:
+            changed = 0
+            for rel in list(self._dirs):  # parents come before their children
+                if rel not in self._dirs:
+                    continue  # dropped along with a parent
+                try:
+                    mtime = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+                except (FileNotFoundError, NotADirectoryError):
+                    self._drop(rel)
+                    changed += 1
+                    continue
+                if mtime != self._dirs[rel][0]:
+                    try:
+                        self._relist(rel)
+                    except (FileNotFoundError, NotADirectoryError):
+                        self._drop(rel)  # vanished between the stat and the listing
+                    changed += 1
+            self._checked = monotonic()
+            if changed or (self.persist and not self.persist.exists()):
+                self._save()
+            return changed
+
+    ''' PERSISTENCE '''
+
+    def _load(self) -> bool:
+        if not self.persist or not self.persist.exists():
+            return False
+        try:
+            data = json.loads(self.persist.read_text())
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != VERSION or data.get('root') != str(self.root) or set(data.get('ignore', ())) != self.ignore:
+            return False
+        for rel, (mtime, subdirs, files) in data['dirs'].items():
+            self._dirs[rel] = (mtime, subdirs, files)
+            for name in subdirs + files:
+                self._add(name, f'{rel}/{name}' if rel else name)
+        return True
+
+    def _save(self) -> None:
+        if not self.persist:
+            return
+        data = {'version': VERSION, 'root': str(self.root), 'ignore': sorted(self.ignore), 'dirs': self._dirs}
+        self.persist.parent.mkdir(parents = True, exist_ok = True)
+        partial = self.persist.with_name(f'.{self.persist.name}.{os.getpid()}.tmp')
+        partial.write_text(json.dumps(data, separators = (',', ':')))
+        os.replace(partial, self.persist)
+
+    ''' LOOKUP '''
+
+    def _names_like(self, pattern: str) -> list[str]:
+        '''Entry names matching a glob, scanning only the names that share its literal prefix.'''
+        if not _magic(pattern):
+            return [pattern] if pattern in self._names else []
+        if self._sorted is None:
+            self._sorted = sorted(self._names)
+        prefix = pattern[: min(pattern.index(c) for c in '*?[' if c in pattern)]
+        out = []
+        for i in range(bisect_left(self._sorted, prefix), len(self._sorted)):
+            name = self._sorted[i]
+            if not name.startswith(prefix):
+                break
+            if fnmatchcase(name, pattern):
+                out.append(name)
+        return out
+
+    def _lookup(self, pattern: str) -> list[str]:
+        parts = [p for p in pattern.replace('\\', '/').split('/') if p and p != '.']
+        if not parts:
+            return []
+        rels = [rel for name in self._names_like(parts[-1]) for rel in self._names[name]]
+        if len(parts) > 1:
+            # 'runs/*/metrics.json' like rglob: the trailing components must match too
+            rels = [rel for rel in rels if _fits(rel.split('/'), parts)]
+        return sorted(rels, key = lambda rel: (rel.count('/'), rel))  # shallowest first, then by name
+
+    def find(self, pattern: str, match: Match = 'all') -> list[Path]:
+        '''
+        Absolute paths of the files and directories matching `pattern`, shallowest first.
+
+        Parameters:
+        -----------
+        pattern : str
+            A name ('model.pt'), a glob on the name ('*.csv'), or trailing path components
+            ('runs/*/metrics.json', 'runs/**/metrics.json'), as `Path.rglob` takes them;
+            '**' stands for any number of directories, none included.
+        match : {'first', 'all', 'unique'}, default='all'
+            'first' stops at the shallowest match; 'unique' raises if there is more than one.
+        '''
+        with self._lock:
+            fresh = monotonic() - self._checked > self.ttl
+            if fresh:
+                self.refresh()
+            rels = self._lookup(pattern)
+            # a miss, or an answer that vanished, may just be news the index has not seen yet
+            if not fresh and (not rels or not os.path.lexists(os.path.join(self.root, rels[0]))):
+                self.refresh()
+                rels = self._lookup(pattern)
+
+        if match == 'unique' and len(rels) > 1:
+            raise ValueError(f"'{pattern}' is ambiguous under {self.root}: {len(rels)} matches, e.g. {rels[0]} and {rels[1]}")
+        if match == 'first':
+            rels = rels[:1]
+        return [self.root / rel for rel in rels]
+
+    def __contains__(self, name: str) -> bool:
+        return bool(self.find(name, 'first'))
+
+    def __len__(self) -> int:
+        return sum(len(paths) for paths in self._names.values())
+
+
+_indexes: dict[tuple[Path, str | None], FileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def index(dir: str | Path | None = None, persist: str | Path | None = None) -> FileIndex:
+    '''The process-wide `FileIndex` of `dir` (the current working directory by default), built on first use.'''
+    root = Path(dir or Path.cwd()).expanduser().resolve()
+    key = (root, str(persist) if persist else None)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = FileIndex(root, persist = persist)
+        return _indexes[key]
+
+
+def _path(f: str | Path, dir: str | Path | None = None, match: Match = 'first', persist: str | Path | None = None) -> Path | list[Path]:
+    '''
+    Searches for a file by name recursively from a given directory, through a cached index.
+
+    Parameters:
+    -----------
+    f : str or Path
+        The name of the file to search for; globs and trailing path components work
+        as they do for `Path.rglob` ('*.csv', 'runs/*/metrics.json').
+    dir : str or Path, optional
+        The directory to start searching from (default: current working directory).
+    match : {'first', 'all', 'unique'}, default='first'
+        'first' returns the shallowest match, 'all' a list of every match (shallowest
+        first), 'unique' the only match -- or raises ValueError if there are several.
+    persist : str or Path, optional
+        JSON file to keep the index of `dir` in between runs.
+
+    Returns:
+    --------
+    Path | list[Path]
+        The absolute path of the found file ('first', 'unique'), or all of them ('all').
+
+    Raises:
+    -------
+    FileNotFoundError
+        If nothing matches.
+    '''
+    if not isinstance(f, (str, Path)) or not isinstance(dir, (str, Path, type(None))):
+        raise TypeError(f'\n\n[INVALID ARGS]: \n\tFunction only accepts type str or Path for <f> and <dir> args.\n')
+
+    found = index(dir, persist).find(str(f), match)
+    if not found:
+        raise FileNotFoundError(f"\"I'm sorry Dave. I'm afraid I can't find '{f}' in {dir or Path.cwd()}\"\n - HAL 9000")
+    return found if match == 'all' else found[0]
+
+
+__all__ = ['FileIndex', 'index', '_path']
+
+
+
+if __name__ == '__main__':
+    import shutil
+    import tempfile
+    from time import perf_counter, sleep
+
+    # a tree of 40 x 25 directories with 20 files each (20k files)
+    with tempfile.TemporaryDirectory() as scratch:
+        root = Path(scratch) / 'tree'
+        for a in range(40):
+            for b in range(25):
+                d = root / f'group{a:02d}' / f'run{b:02d}'
+                d.mkdir(parents = True)
+                for i in range(20):
+                    (d / f'part{i:02d}.csv').touch()
+                (d / 'metrics.json').touch()
+        (root / 'group07' / 'run03' / 'needle.txt').touch()
+        (root / '.git').mkdir()
+        (root / '.git' / 'needle.txt').touch()
+        (root / 'x.txt').touch()
+        (root / 'group02' / 'run04' / 'x.txt').touch()
+
+        start = perf_counter()
+        idx = FileIndex(root, ttl = 0)
+        build = perf_counter() - start
+
+        assert _path('needle.txt', root) == (root / 'group07' / 'run03' / 'needle.txt')
+        assert len(_path('metrics.json', root, match = 'all')) == 1000
+        assert len(idx.find('group0[0-4]/*/part1?.csv')) == 5 * 25 * 10
+        assert {p.name for p in idx.find('run0*')} == {f'run0{i}' for i in range(10)}
+        for pattern in ('**/x.txt', 'x.txt', 'group*/**/x.txt', '**/run04/x.txt', 'group02/**/**/x.txt'):
+            assert idx.find(pattern) == sorted(root.rglob(pattern), key = lambda p: (len(p.parts), p)), pattern
+        assert len(idx.find('group00/**/metrics.json')) == 25 and not idx.find('run04/**/group02/x.txt')
+        try:
+            _path('metrics.json', root, match = 'unique')
+            raise AssertionError('ambiguous lookup did not raise')
+        except ValueError:
+            pass
+        print(f'[TEST] name / glob / path-suffix lookups ({len(idx):,} entries indexed in {build * 1e3:.0f} ms)')
+
+        # invalidation: new, deleted, renamed and whole new directories
+        sleep(0.01)
+        (root / 'group39' / 'run24' / 'late.txt').touch()
+        assert idx.find('late.txt')
+        os.rename(root / 'group39' / 'run24' / 'late.txt', root / 'group00' / 'later.txt')
+        assert not idx.find('late.txt') and idx.find('later.txt')
+        shutil.rmtree(root / 'group05')
+        (root / 'new' / 'deep').mkdir(parents = True)
+        (root / 'new' / 'deep' / 'x.csv').touch()
+        assert idx.refresh() and len(idx.find('metrics.json')) == 975 and idx.find('x.csv') == [root / 'new' / 'deep' / 'x.csv']
+        print('[TEST] directory mtimes pick up created, renamed and deleted files and directories')
+
+        # persistence: a second process loads the JSON and only re-lists what changed
+        store = root.parent / 'index.json'
+        FileIndex(root, persist = store)
+        (root / 'group01' / 'run01' / 'offline.txt').touch()
+        start = perf_counter()
+        warm = FileIndex(root, persist = store)
+        load = perf_counter() - start
+        assert warm.find('offline.txt') and len(warm) == len(FileIndex(root))
+        print(f'[TEST] persisted index: warm start in {load * 1e3:.0f} ms vs {build * 1e3:.0f} ms cold')
+
+        # lookups: rglob (the notebook version) vs the index
+        start = perf_counter()
+        for _ in range(10):
+            next(root.rglob('needle.txt'))
+        rglob = (perf_counter() - start) / 10
+        cached = FileIndex(root)
+        start = perf_counter()
+        for _ in range(1000):
+            cached.find('needle.txt', 'first')
+        hit = (perf_counter() - start) / 1000
+        start = perf_counter()
+        for _ in range(100):
+            cached.find('part0*.csv')
+        globbed = (perf_counter() - start) / 100
+        start = perf_counter()
+        cached.refresh()
+        check = perf_counter() - start
+        print(f'[BENCH] rglob {rglob * 1e3:.1f} ms per lookup; index {hit * 1e6:.1f} us by name, '
+              f'{globbed * 1e3:.1f} ms for a 10k-match glob, {check * 1e3:.1f} ms to re-check {len(cached._dirs):,} directory mtimes')
@@ -0,0 +1,347 @@
+"""
+Batched vector kernels for vectors.ipynb.
+
+`point_distance`, `_l2` and `_hat_xy` in the notebook take one point per call and
+convert it with `np.asarray` every time, so a loop over a million points is a million
+Python calls. The versions here keep the notebook names and accept either one vector
+`(D,)` or a batch `(N, D)`:
+
+    - _l2:             row norms, `einsum('ij,ij->i')` + sqrt, no squared temporary
+    - _hat / _hat_xy:  unit vectors / one component of them
+    - point_distance:  distance of each point to its line (or segment, `segment=True`);
+                       lines may be one `(D,)` pair for all points or an `(N, D)` pair each
+
+Every function takes an optional `out=` buffer, keeps float32 inputs in float32 --
+list or scalar arguments are cast to the arrays' dtype, float16 and non-float inputs
+become float32, as in the notebook -- and works through large
+batches `BLOCK_BYTES` of input at a time so the per-chunk temporaries stay in cache.
+"""
+
+import numpy as np
+from numpy.typing import NDArray, ArrayLike
+from typing import TypeVar
+
+F = TypeVar("F", float, np.floating)
+
+# rows are processed in chunks of about this many bytes of input
+BLOCK_BYTES = 1 << 18
+
+
+def _floats(*arrays: ArrayLike) -> tuple[NDArray, ...]:
+    """
+    Arrays in one float dtype, taken from the numpy inputs: float32 and float64 stay as they
+    are, float16 and non-floats -> float32. Lists and Python scalars follow the arrays (a
+    `[3.0, 6.3]` endpoint does not make a float32 batch float64); only when there are no
+    numpy float inputs do their own float64s count.
+    """
+    typed = [a.dtype for a in arrays if isinstance(a, (np.ndarray, np.generic)) and a.dtype.kind == "f"]
+    arrays = [np.asarray(a) for a in arrays]
+    kinds = typed or [a.dtype for a in arrays if a.dtype.kind == "f"]
+    dtype = np.result_type(*kinds) if kinds else np.dtype(np.float32)
+    if dtype.itemsize < 4:
+        dtype = np.dtype(np.float32)
+    return tuple(a if a.dtype == dtype else a.astype(dtype) for a in arrays)
+
+
+def _rows(n: int, d: int, itemsize: int) -> int:
+    return max(256, min(n, BLOCK_BYTES // max(1, d * itemsize)))
+
+
+def _output(out: NDArray | None, shape: tuple[int, ...], dtype: np.dtype) -> NDArray:
+    if out is None:
+        return np.empty(shape, dtype = dtype)
+    if out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}.")
+    return out
+
+
+def _batch(v: NDArray, name: str = "v") -> NDArray:
+    if v.ndim not in (1, 2) or v.shape[-1] == 0:
+        raise ValueError(f"{name} must be a vector (D,) or a batch of vectors (N, D), got shape {v.shape}.")
+    return v.reshape(1, -1) if v.ndim == 1 else v
+
+
+''' NORMS '''
+
+def _l2(v: NDArray[F] | ArrayLike, out: NDArray[F] | None = None) -> NDArray[F] | F:
+    """
+    Computes the Euclidean norm (magnitude) of a vector, or of every row of a batch.
+
+    Parameters:
+    -----------
+    v : NDArray[F] | Sequence[F]
+        A vector (D,) or a batch of vectors (N, D).
+    out : NDArray[F], optional
+        (N,) buffer for the norms.
+
+    Returns:
+    --------
+    NDArray[F] | F
+        (N,) norms for a batch, a scalar for a single vector.
+
+    Notes:
+    ------
+    - ||v|| = sqrt(v_x^2 + v_y^2 + ... + v_n^2), summed by einsum without a v**2 temporary.
+    """
+    (v,) = _floats(v)
+    single = v.ndim == 1
+    v = _batch(v)
+    n, d = v.shape
+    result = _output(out, (n,) if not single or out is not None else (1,), v.dtype)
+    flat = result.reshape(n)
+
+    step = _rows(n, d, v.itemsize)
+    for s in range(0, n, step):
+        chunk = slice(s, s + step)
+        np.einsum("ij,ij->i", v[chunk], v[chunk], out = flat[chunk])
+        np.sqrt(flat[chunk], out = flat[chunk])
+
+    return result[0] if single and out is None else result
+
+
+def _hat(v: NDArray[F] | ArrayLike, out: NDArray[F] | None = None) -> NDArray[F]:
+    """
+    Unit vectors: every row of `v` divided by its norm.
+
+    Parameters:
+    -----------
+    v : NDArray[F] | Sequence[F]
+        A vector (D,) or a batch of vectors (N, D).
+    out : NDArray[F], optional
+        Buffer shaped like `v`; may be `v` itself to normalize in place.
+
+    Raises:
+    -------
+    ValueError
+        If any vector is a zero vector (the index of the first one is reported).
+    """
+    (v,) = _floats(v)
+    shape = v.shape
+    v = _batch(v)
+    n, d = v.shape
+    result = _output(out, shape, v.dtype).reshape(n, d)
+
+    step = _rows(n, d, v.itemsize)
+    norms = np.empty(min(n, step), dtype = v.dtype)
+    for s in range(0, n, step):
+        chunk = slice(s, s + step)
+        m = len(v[chunk])
+        _l2(v[chunk], out = norms[:m])
+        if not norms[:m].all():
+            raise ValueError(f"Cannot compute unit vector for a zero vector (row {s + int(np.argmin(norms[:m] != 0))}).")
+        np.divide(v[chunk], norms[:m, None], out = result[chunk])
+
+    return result.reshape(shape)
+
+
+def _hat_xy(v: NDArray[F] | ArrayLike, use_y: bool = False, out: NDArray[F] | None = None) -> NDArray[F] | F:
+    """
+    Computes the unit vector's x- or y-component, for one 2D vector or a batch (N, 2).
+
+    Parameters:
+    -----------
+    v : NDArray[F] | Sequence[F]
+        A 2D vector (2,) or a batch of them (N, 2).
+    use_y : bool, default=False
+        If True, returns the y-component of the unit vector instead of the x-component.
+    out : NDArray[F], optional
+        (N,) buffer for the components.
+
+    Returns:
+    --------
+    NDArray[F] | F
+        (N,) components for a batch, a scalar for a single vector.
+
+    Raises:
+    -------
+    ValueError
+        If the vectors are not 2D, or any is a zero vector.
+    """
+    (v,) = _floats(v)
+    if v.shape[-1:] != (2,) or v.ndim > 2:
+        raise ValueError("Input vector must be a 2D vector (shape (2,) or (N, 2)).")
+    single = v.ndim == 1
+    v = _batch(v)
+
+    result = _l2(v, out = _output(out, (len(v),), v.dtype) if out is not None else None)
+    if not result.all():
+        raise ValueError(f"Cannot compute unit vector for a zero vector (row {int(np.argmin(result != 0))}).")
+    np.divide(v[:, int(use_y)], result, out = result)
+
+    return result[0] if single and out is None else result
+
+
+''' DISTANCES '''
+
+def point_distance(
+    p: NDArray[F] | ArrayLike,
+    v1: NDArray[F] | ArrayLike,
+    v2: NDArray[F] | ArrayLike,
+    segment: bool = False,
+    out: NDArray[F] | None = None,
+) -> NDArray[F] | F:
+    """
+    Computes the shortest distance from points to the lines (or segments) through v1 and v2.
+
+    Parameters:
+    -----------
+    p : NDArray[F] | Sequence[F]
+        A point (D,) or a batch of points (N, D), in any dimension.
+    v1 : NDArray[F] | Sequence[F]
+        The first point of the line: one (D,) for every point, or one per point (N, D).
+    v2 : NDArray[F] | Sequence[F]
+        The second point of the line, shaped like `v1`.
+    segment : bool, default=False
+        Distance to the finite segment v1-v2 instead of the infinite line.
+    out : NDArray[F], optional
+        (N,) buffer for the distances.
+
+    Returns:
+    --------
+    NDArray[F] | F
+        (N,) distances for a batch, a scalar when every input is a single point.
+
+    Example:
+    --------
+    >>> p = np.random.rand(1_000_000, 2).astype(np.float32)
+    >>> point_distance(p, [3.0, 6.3], [0.2, 1.6])            # (1_000_000,) float32
+    >>> point_distance(p, a, b, segment = True)              # a, b: (1_000_000, 2)
+
+    Notes:
+    ------
+    - With w = p - v1 and d = v2 - v1, the closest point is v1 + t d with t = (w . d) / (d . d)
+      (clipped to [0, 1] for segments); the distance is ||w - t d||. The residual form
+      avoids the cancellation of sqrt(|w|^2 - (w . d)^2 / |d|^2) for far-away points.
+    - A zero-length segment is just the point v1; a zero-length line raises.
+
+    Complexity:
+    -----------
+    - O(N D) time, O(BLOCK_BYTES) of temporaries whatever N is.
+    """
+    p, v1, v2 = _floats(p, v1, v2)
+    single = p.ndim == 1 and v1.ndim == 1
+    if v1.shape != v2.shape:
+        raise ValueError("v1 and v2 must have the same shape.")
+    if p.shape[-1] != v1.shape[-1]:
+        raise ValueError("p, v1, and v2 must have the same dimension.")
+    p, v1, v2 = _batch(p, "p"), _batch(v1, "v1"), _batch(v2, "v2")
+    per_point = len(v1) > 1
+    n = max(len(p), len(v1))
+    if (len(p) not in (1, n)) or (len(v1) not in (1, n)):
+        raise ValueError(f"Cannot pair {len(p)} points with {len(v1)} lines.")
+    d = p.shape[1]
+
+    result = _output(out, (n,) if not single or out is not None else (1,), p.dtype)
+    flat = result.reshape(n)
+
+    step = _rows(n, d, p.itemsize)
+    for s in range(0, n, step):
+        chunk = slice(s, s + step)
+        pc = p[chunk] if len(p) > 1 else p
+        a = v1[chunk] if per_point else v1
+        direction = v2[chunk] - a if per_point else v2 - v1
+
+        w = pc - a                                          # (m, D), the only full-size temporary
+        dd = np.einsum("ij,ij->i", direction, direction)
+        t = np.einsum("ij,ij->i", w, np.broadcast_to(direction, w.shape))
+
+        if segment:
+            zero = np.broadcast_to(dd == 0, t.shape)        # zero-length segment: closest point is v1
+            np.divide(t, dd, out = t, where = ~zero)
+            t[zero] = 0
+            np.clip(t, 0, 1, out = t)
+        else:
+            if not dd.all():
+                raise ValueError("v1 and v2 must not be the same (non-zero direction vector).")
+            t /= dd
+
+        w -= t[:, None] * direction
+        np.einsum("ij,ij->i", w, w, out = flat[chunk])
+        np.sqrt(flat[chunk], out = flat[chunk])
+
+    return result[0] if single and out is None else result
+
+
+__all__ = ["point_distance", "_l2", "_hat", "_hat_xy"]
+
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    rng = np.random.default_rng(0)
+
+    # the notebook examples, single point
+    assert abs(point_distance([-0.6, -6.9], [3.0, 6.3], [0.2, 1.6]) - 3.6631) < 1e-3
+    assert abs(point_distance([1.0, 2.0, 3.0], [0, 0, 0], [1.0, 1.0, 1.0]) - 1.4142) < 1e-3
+    assert abs(_l2([3.0, 4.0, 12.0]) - 13) < 1e-6 and abs(_hat_xy([-5.6, 7.2], use_y = True) - 0.7894) < 1e-3
+
+    def reference(p, v1, v2, segment):
+        # float64, one point at a time
+        p, v1, v2 = (np.asarray(x, np.float64) for x in (p, v1, v2))
+        d, w = v2 - v1, p - v1
+        t = w @ d / (d @ d) if d @ d else 0.0
+        t = min(1.0, max(0.0, t)) if segment else t
+        return np.linalg.norm(w - t * d)
+
+    # batches: shared line, a line per point, segments, 3D, float32 kept
+    for dim in (2, 3):
+        p = rng.standard_normal((5000, dim)).astype(np.float32)
+        a, b = rng.standard_normal((2, 5000, dim)).astype(np.float32)
+        b[7] = a[7]  # a zero-length segment
+        for segment in (False, True):
+            for v1, v2 in ((a[0], b[0]), (a, b)):
+                if not segment and v1.ndim == 2:
+                    v1, v2 = v1.copy(), v2.copy()
+                    v2[7] += 1
+                got = point_distance(p, v1, v2, segment = segment)
+                want = [reference(p[i], v1 if v1.ndim == 1 else v1[i], v2 if v2.ndim == 1 else v2[i], segment) for i in range(len(p))]
+                assert got.dtype == np.float32 and np.allclose(got, want, atol = 1e-4), (dim, segment, v1.ndim)
+    v = rng.standard_normal((5000, 2))
+    assert np.allclose(_l2(v), np.linalg.norm(v, axis = 1)) and np.allclose(_hat(v), v / np.linalg.norm(v, axis = 1)[:, None])
+    assert np.allclose(_hat_xy(v, use_y = True), v[:, 1] / np.linalg.norm(v, axis = 1))
+    buffer = np.empty(5000, np.float64)
+    assert _l2(v, out = buffer) is buffer
+    print("[TEST] batched point_distance / _l2 / _hat / _hat_xy == per-point float64 reference")
+
+    # list / scalar endpoints follow the float32 batch instead of promoting it; float16 -> float32
+    p32 = rng.standard_normal((1000, 2)).astype(np.float32)
+    assert point_distance(p32, [3.0, 6.3], [0.2, 1.6]).dtype == np.float32
+    assert point_distance(p32, np.array([3.0, 6.3]), [0.2, 1.6]).dtype == np.float64  # a float64 array still wins
+    assert _l2(p32.astype(np.float16)).dtype == np.float32 and _l2([3, 4]).dtype == np.float32
+    assert isinstance(_l2([3.0, 4.0]), np.float64)
+    print("[TEST] list endpoints keep float32 batches float32, float16 -> float32")
+
+    def bench(fn, repeat = 3):
+        best = float("inf")
+        for _ in range(repeat):
+            start = perf_counter()
+            fn()
+            best = min(best, perf_counter() - start)
+        return best
+
+    def point_distance_nb(p, v1, v2):
+        # vectors.ipynb's version
+        p, v1, v2 = (np.asarray(x, dtype = np.float32) for x in (p, v1, v2))
+        w, d = p - v1, v2 - v1
+        u = d / np.sqrt(d @ d)
+        return np.linalg.norm(p - ((w @ u) * u + v1))
+
+    N = 4_000_000
+    p = rng.standard_normal((N, 2)).astype(np.float32)
+    a, b = rng.standard_normal((2, N, 2)).astype(np.float32)
+    dist = np.empty(N, np.float32)
+
+    loop = bench(lambda: [point_distance_nb(p[i], a[i], b[i]) for i in range(20_000)], 1) / 20_000 * N
+    print(f"\n[BENCH] {N:,} 2D points, one segment each")
+    print(f"  notebook, Python loop (extrapolated): {loop:8.2f} s")
+    for label, dtype in (("float32", np.float32), ("float64", np.float64)):
+        pp, aa, bb = p.astype(dtype), a.astype(dtype), b.astype(dtype)
+        out = np.empty(N, dtype)
+        chunked = bench(lambda: point_distance(pp, aa, bb, segment = True, out = out))
+        BLOCK_BYTES, saved = 1 << 40, BLOCK_BYTES  # one pass over everything, for comparison
+        whole = bench(lambda: point_distance(pp, aa, bb, segment = True, out = out))
+        BLOCK_BYTES = saved
+        print(f"  batched {label}: {chunked:8.3f} s chunked, {whole:8.3f} s in one pass")
+    print(f"  _l2 over {N:,} float32 rows: {bench(lambda: _l2(p, out = dist)) * 1e3:.1f} ms "
+          f"(np.linalg.norm(axis = 1): {bench(lambda: np.linalg.norm(p, axis = 1)) * 1e3:.1f} ms)")